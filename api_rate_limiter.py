@@ -12,6 +12,7 @@ import hashlib
 import asyncio
 import threading
 from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 from typing import Dict, Optional, Any, Callable
@@ -33,6 +34,55 @@ class APIResponse:
     timestamp: datetime
     cache_key: str
 
+class ConcurrencyController:
+    """Adaptive cap on in-flight requests for one API.
+    
+    The cap is halved whenever the API answers 429 and grows back by one after
+    every `ramp_up_after` consecutive successes, so concurrency settles just
+    below the provider's real limit.
+    """
+    
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 8,
+                 ramp_up_after: int = 10):
+        self.current_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.ramp_up_after = ramp_up_after
+        self.in_flight = 0
+        self.successes = 0
+        self.last_throttle = None
+        self.condition = threading.Condition()
+    
+    @contextmanager
+    def slot(self):
+        """Hold one of the currently allowed request slots."""
+        with self.condition:
+            while self.in_flight >= self.current_limit:
+                self.condition.wait()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.in_flight -= 1
+                self.condition.notify()
+    
+    def on_throttle(self):
+        """Halve the limit after a 429 response."""
+        with self.condition:
+            self.current_limit = max(self.min_limit, self.current_limit // 2)
+            self.successes = 0
+            self.last_throttle = datetime.now()
+    
+    def on_success(self):
+        """Raise the limit by one after enough consecutive successes."""
+        with self.condition:
+            self.successes += 1
+            if self.successes >= self.ramp_up_after and self.current_limit < self.max_limit:
+                self.current_limit += 1
+                self.successes = 0
+                self.condition.notify()
+
 class APIRateLimiter:
     """Thread-safe rate limiter with caching and usage monitoring."""
     
@@ -60,6 +110,9 @@ class APIRateLimiter:
             )
         }
         
+        # Adaptive in-flight request caps, created per API on first use
+        self.concurrency = {}
+        
         # Response cache (in-memory)
         self.cache = {}
         self.cache_ttl = {
@@ -168,15 +221,36 @@ class APIRateLimiter:
             'timestamp': datetime.now()
         }
     
-    def _make_request_with_backoff(self, request_func: Callable, max_retries: int = 3) -> Any:
+    def get_concurrency_controller(self, api_name: str) -> ConcurrencyController:
+        """Get (or create) the concurrency controller for an API."""
+        with self.lock:
+            controller = self.concurrency.get(api_name)
+            if controller is None:
+                rate_limit = self.rate_limits.get(api_name)
+                if rate_limit:
+                    controller = ConcurrencyController(
+                        initial_limit=rate_limit.burst_size,
+                        max_limit=rate_limit.burst_size * 2
+                    )
+                else:
+                    controller = ConcurrencyController()
+                self.concurrency[api_name] = controller
+            return controller
+    
+    def _make_request_with_backoff(self, request_func: Callable, max_retries: int = 3,
+                                   controller: Optional[ConcurrencyController] = None) -> Any:
         """Make API request with exponential backoff on rate limit errors."""
         for attempt in range(max_retries):
             try:
-                response = request_func()
+                with controller.slot() if controller else nullcontext():
+                    response = request_func()
                 
                 # Check for rate limit responses
                 if hasattr(response, 'status_code'):
                     if response.status_code == 429:  # Too Many Requests
+                        if controller:
+                            controller.on_throttle()
+                        
                         # Extract retry-after header if available
                         retry_after = response.headers.get('Retry-After')
                         if retry_after:
@@ -189,6 +263,8 @@ class APIRateLimiter:
                         time.sleep(wait_time)
                         continue
                     elif response.status_code == 200:
+                        if controller:
+                            controller.on_success()
                         return response
                     else:
                         print(f"API error: {response.status_code} - {response.text}")
@@ -240,7 +316,8 @@ class APIRateLimiter:
         
         try:
             # Make the actual request (outside the lock)
-            response = self._make_request_with_backoff(request_func)
+            controller = self.get_concurrency_controller(api_name)
+            response = self._make_request_with_backoff(request_func, controller=controller)
             
             # Cache the response
             with self.lock:
@@ -286,6 +363,8 @@ class APIRateLimiter:
         """Update rate limits for an API."""
         with self.lock:
             self.rate_limits[api_name] = rate_limit
+            # Rebuild the concurrency controller from the new burst size
+            self.concurrency.pop(api_name, None)
     
     def clear_cache(self, operation: str = None):
         """Clear cache for specific operation or all cache."""
@@ -321,6 +400,10 @@ class APIRateLimiter:
             
             hit_rate = stats['cache_info']['cache_hit_rate'].get(api_name, 0)
             print(f"  Cache Hit Rate: {hit_rate:.1f}%")
+            
+            controller = self.concurrency.get(api_name)
+            if controller:
+                print(f"  Concurrency Limit: {controller.current_limit}/{controller.max_limit}")
         
         print(f"\nCACHE INFO:")
         print(f"  Total Cached Items: {stats['cache_info']['total_cached_items']}")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Classification Cache
+--------------------
+Remembers the sentiment and category assigned to templated emails so that
+recurring messages (newsletters, notifications, invoices) skip both API calls.
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+DATA_DIR = os.path.join(os.getcwd(), 'data')
+CACHE_PATH = os.path.join(DATA_DIR, 'classification_cache.json')
+
+# Normalization patterns: templated emails usually differ only in numbers
+# (dates, amounts, order IDs) and whitespace
+DIGITS_PATTERN = re.compile(r'\d+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+class ClassificationCache:
+    """Thread-safe cache of (sentiment, category) keyed by normalized email content."""
+
+    def __init__(self, cache_path: str = CACHE_PATH, max_entries: int = 5000, body_length: int = 500):
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.body_length = body_length
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.dirty = False
+        self.stats = {'hits': 0, 'misses': 0}
+        self._load()
+
+    def _normalize(self, text: str) -> str:
+        """Lowercase, mask digit runs and collapse whitespace."""
+        text = DIGITS_PATTERN.sub('0', text.lower())
+        return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+    def _generate_key(self, email_data: Dict[str, Any]) -> str:
+        """Generate a cache key from sender, subject and the start of the body."""
+        body = email_data.get('content', '')[:self.body_length]
+        key_source = '\x00'.join([
+            email_data.get('from', '').lower(),
+            self._normalize(email_data.get('subject', '')),
+            self._normalize(body)
+        ])
+        return hashlib.blake2b(key_source.encode('utf-8'), digest_size=16).hexdigest()
+
+    def _load(self):
+        """Load persisted entries, ignoring a missing or corrupt file."""
+        try:
+            with open(self.cache_path, 'r') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, email_data: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """Return cached (sentiment, category) for an email, if any."""
+        key = self._generate_key(email_data)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            return entry['sentiment'], entry['category']
+
+    def put(self, email_data: Dict[str, Any], sentiment: str, category: str):
+        """Record the classification for an email."""
+        key = self._generate_key(email_data)
+        with self.lock:
+            self.entries[key] = {
+                'sentiment': sentiment,
+                'category': category,
+                'timestamp': datetime.now().isoformat()
+            }
+
+            # Evict the oldest entries once over capacity (dicts keep insertion order)
+            while len(self.entries) > self.max_entries:
+                del self.entries[next(iter(self.entries))]
+
+            self.dirty = True
+
+    def save(self):
+        """Persist entries to disk if anything changed."""
+        with self.lock:
+            if not self.dirty:
+                return
+            snapshot = dict(self.entries)
+            self.dirty = False
+
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Error saving classification cache: {e}")
+
+    def clear(self):
+        """Remove all cached classifications."""
+        with self.lock:
+            self.entries.clear()
+            self.dirty = True
+
+# Global classification cache instance
+classification_cache = ClassificationCache()
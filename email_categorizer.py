@@ -13,15 +13,21 @@ import email.header
 import os
 import sys
 import json
+import re
 import requests
+from requests.adapters import HTTPAdapter
 import configparser
+import functools
 from credential_manager import load_config_secure
 from api_rate_limiter import throttled_huggingface_request, throttled_openai_request, rate_limiter
 from email_parser import get_enhanced_email_content
 from email_providers import provider_manager, detect_email_provider
 from batch_processor import process_emails_in_batches, batch_processor
+from sender_rules import sender_rules, rule_headers
 import time
 import random
+import threading
+import zlib
 from email.utils import parsedate_to_datetime
 from datetime import datetime, timedelta
 
@@ -34,6 +40,32 @@ BASE_RETRY_DELAY = 1  # seconds
 MAX_RETRY_DELAY = 60  # seconds
 CONNECTION_TIMEOUT = 30  # seconds
 
+# Bulk fetch configuration
+FETCH_BATCH_SIZE = 100  # messages per FETCH command
+UID_PATTERN = re.compile(rb'UID (\d+)')
+
+# Sentiment analysis configuration
+SENTIMENT_API_URL = "https://api-inference.huggingface.co/models/distilbert-base-uncased-finetuned-sst-2-english"
+SENTIMENT_MAX_LENGTH = 1000  # characters sent per text
+SENTIMENT_BATCH_SIZE = 32  # texts per Hugging Face request
+HTTP_TIMEOUT = (5, 30)  # (connect, read) seconds for API requests
+
+def _create_http_session(pool_maxsize=8):
+    """Create an HTTP session that keeps connections alive between API calls."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    return session
+
+# One pooled session per API host so TLS connections are reused across emails
+HF_SESSION = _create_http_session()
+OPENAI_SESSION = _create_http_session()
+
+# On-device sentiment model (loaded lazily when [Hugging Face] local_model_path is set)
+_local_sentiment_pipeline = None
+_local_sentiment_loaded = False
+_local_sentiment_lock = threading.Lock()
+
 CATEGORIES = [
     "Client Communication",
     "Client_Communication",
@@ -50,8 +82,17 @@ CATEGORIES = [
     "Urgent & Time-Sensitive"
 ]
 
+# Constant-time validation of categories returned by the model
+CATEGORY_SET = frozenset(CATEGORIES)
+
+@functools.lru_cache(maxsize=1)
 def load_config():
-    """Load configuration securely (encrypted preferred, fallback to plaintext)."""
+    """Load configuration securely (encrypted preferred, fallback to plaintext).
+    
+    The result is cached, so the file is decrypted (and any master password
+    prompted for) once per process. Callers must not modify the returned
+    ConfigParser; use load_config.cache_clear() after changing the file.
+    """
     try:
         # Try to load encrypted config first
         config = load_config_secure(CONFIG_FILE, 'config.encrypted')
@@ -75,6 +116,77 @@ def load_config():
         print(f"Error loading configuration: {e}")
         sys.exit(1)
 
+def enable_imap_compression(mail):
+    """Negotiate COMPRESS=DEFLATE (RFC 4978) so commands and FETCH responses travel compressed.
+    
+    imaplib has no COMPRESS support, so the connection's send/read/readline are
+    replaced with versions that deflate and inflate the stream.
+    
+    Args:
+        mail: Logged-in IMAP connection
+        
+    Returns:
+        True if compression is active, False if the server does not offer it
+    """
+    result, data = mail.capability()
+    if result != 'OK' or b'COMPRESS=DEFLATE' not in data[0].upper().split():
+        return False
+    
+    imaplib.Commands.setdefault('COMPRESS', ('AUTH', 'SELECTED'))
+    result, _ = mail._simple_command('COMPRESS', 'DEFLATE')
+    if result != 'OK':
+        return False
+    
+    sock = mail.sock
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    decompressor = zlib.decompressobj(-15)
+    inflated = bytearray()
+    
+    def fill():
+        # A deflate block may span several reads before it yields output
+        while True:
+            chunk = sock.recv(16384)
+            if not chunk:
+                raise mail.abort('socket error: EOF')
+            data = decompressor.decompress(chunk)
+            if data:
+                inflated.extend(data)
+                return
+    
+    def read(size):
+        while len(inflated) < size:
+            fill()
+        data = bytes(inflated[:size])
+        del inflated[:size]
+        return data
+    
+    def readline():
+        while b'\n' not in inflated:
+            if len(inflated) > imaplib._MAXLINE:
+                raise mail.error(f"got more than {imaplib._MAXLINE} bytes")
+            fill()
+        end = inflated.index(b'\n') + 1
+        line = bytes(inflated[:end])
+        del inflated[:end]
+        return line
+    
+    def recv(bufsize=16384):
+        # Raw reads (IMAP IDLE) must also go through the inflater
+        if not inflated:
+            fill()
+        data = bytes(inflated[:bufsize])
+        del inflated[:bufsize]
+        return data
+    
+    def send(data):
+        sock.sendall(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH))
+    
+    mail.read = read
+    mail.readline = readline
+    mail.send = send
+    mail._recv = recv
+    return True
+
 def connect_to_mail_server(config):
     """Connect to the mail server using the provided configuration with retry logic and provider support."""
     last_exception = None
@@ -110,13 +222,21 @@ def connect_to_mail_server(config):
             # Login with provider-specific handling
             mail.login(config['IMAP']['username'], config['IMAP']['password'])
             
+            # Opt-in: compress traffic when the server allows it (falls back to plain IMAP)
+            if config.getboolean('IMAP', 'compress', fallback=False):
+                try:
+                    if enable_imap_compression(mail):
+                        print("ℹ️  IMAP compression (COMPRESS=DEFLATE) enabled")
+                except imaplib.IMAP4.error as e:
+                    print(f"IMAP compression unavailable, continuing uncompressed: {e}")
+            
             # Connection health check
             mail.noop()
             
             print(f"Successfully connected to {provider_config.name}")
             
             # Log provider-specific information
-            if provider_config.quirks.get('app_password_required'):
+            if provider_config.quirks.app_password_required:
                 print("ℹ️  Using app-specific password authentication")
             if provider_config.oauth2_enabled:
                 print("ℹ️  OAuth2 authentication available for this provider")
@@ -159,7 +279,8 @@ def get_email_content(msg):
             'text_content': enhanced_result.get('text_content', ''),
             'has_html': enhanced_result.get('has_html', False),
             'attachments': enhanced_result.get('attachments', []),
-            'encoding_issues': enhanced_result.get('encoding_issues', False)
+            'encoding_issues': enhanced_result.get('encoding_issues', False),
+            **rule_headers(msg)
         }
     except Exception as e:
         print(f"Error in enhanced email parsing, falling back to basic parsing: {e}")
@@ -229,22 +350,66 @@ def get_email_content(msg):
             'text_content': content,
             'has_html': False,
             'attachments': [],
-            'encoding_issues': True
+            'encoding_issues': True,
+            **rule_headers(msg)
         }
 
+def _get_local_sentiment_pipeline(config):
+    """Return the on-device sentiment pipeline, or None to use the Hugging Face API.
+    
+    The model directory is expected to hold an ONNX export of
+    distilbert-base-uncased-finetuned-sst-2-english (ideally INT8-quantized
+    with optimum) together with its tokenizer files.
+    """
+    global _local_sentiment_pipeline, _local_sentiment_loaded
+    
+    if _local_sentiment_loaded:
+        return _local_sentiment_pipeline
+    
+    with _local_sentiment_lock:
+        if _local_sentiment_loaded:
+            return _local_sentiment_pipeline
+        
+        model_path = config['Hugging Face'].get('local_model_path', '').strip()
+        if model_path:
+            try:
+                from optimum.onnxruntime import ORTModelForSequenceClassification
+                from transformers import AutoTokenizer, pipeline
+                
+                model = ORTModelForSequenceClassification.from_pretrained(
+                    model_path, provider='CPUExecutionProvider'
+                )
+                tokenizer = AutoTokenizer.from_pretrained(model_path)
+                _local_sentiment_pipeline = pipeline('sentiment-analysis', model=model, tokenizer=tokenizer)
+                print(f"Using on-device sentiment model from {model_path}")
+            except ImportError:
+                print("Warning: optimum/onnxruntime not available, using Hugging Face API for sentiment")
+            except Exception as e:
+                print(f"Error loading local sentiment model, using Hugging Face API: {e}")
+        
+        _local_sentiment_loaded = True
+        return _local_sentiment_pipeline
+
 def analyze_sentiment(text, config):
     """Analyze sentiment of the text using Hugging Face API with rate limiting."""
+    return _try_analyze_sentiment(text, config) or "NEUTRAL"
+
+def _try_analyze_sentiment(text, config):
+    """Analyze sentiment of the text, returning None instead of a fallback label on failure."""
     try:
         # Truncate text if it's too long
-        max_len = 1000  # Arbitrary limit to avoid huge API calls
-        if len(text) > max_len:
-            text = text[:max_len]
+        if len(text) > SENTIMENT_MAX_LENGTH:
+            text = text[:SENTIMENT_MAX_LENGTH]
         
-        api_url = "https://api-inference.huggingface.co/models/distilbert-base-uncased-finetuned-sst-2-english"
+        local_pipeline = _get_local_sentiment_pipeline(config)
+        if local_pipeline is not None:
+            return _parse_sentiment_label(local_pipeline(text, truncation=True))
+        
+        api_url = SENTIMENT_API_URL
         headers = {"Authorization": f"Bearer {config['Hugging Face']['api_key']}"}
         
         def make_request():
-            return requests.post(api_url, headers=headers, json={"inputs": text})
+            return HF_SESSION.post(api_url, headers=headers, json={"inputs": text}, timeout=HTTP_TIMEOUT)
         
         # Use rate limiter
         api_response = throttled_huggingface_request(text, make_request)
@@ -255,7 +420,7 @@ def analyze_sentiment(text, config):
         
         if hasattr(response, 'status_code') and response.status_code != 200:
             print(f"Error from Hugging Face API: {response.text}")
-            return "NEUTRAL"
+            return None
         
         # Handle cached responses (already parsed)
         if isinstance(response, str):
@@ -270,16 +435,81 @@ def analyze_sentiment(text, config):
         # The structure might be an array with label and score
         if isinstance(result, list) and len(result) > 0:
             # Return the predicted label (e.g., "POSITIVE", "NEGATIVE")
-            sentiment = result[0].get('label', 'NEUTRAL')
-            return sentiment
+            return _parse_sentiment_label(result[0])
         
-        return "NEUTRAL"
+        return None
     except Exception as e:
         print(f"Error analyzing sentiment: {e}")
-        return "NEUTRAL"
+        return None
+
+def _parse_sentiment_label(item):
+    """Extract the top label from one Hugging Face classification result."""
+    # Results come either as a dict or as a list of dicts sorted by score
+    if isinstance(item, list):
+        item = item[0] if item else {}
+    if isinstance(item, dict):
+        return item.get('label', 'NEUTRAL')
+    return "NEUTRAL"
+
+def analyze_sentiment_batch(texts, config):
+    """Analyze sentiment of many texts with one Hugging Face request per chunk.
+    
+    Args:
+        texts: List of texts to analyze
+        config: Configuration object
+        
+    Returns:
+        List of sentiment labels aligned with `texts`; None where the analysis
+        failed, so callers can tell a fallback from a real NEUTRAL result
+    """
+    headers = {"Authorization": f"Bearer {config['Hugging Face']['api_key']}"}
+    local_pipeline = _get_local_sentiment_pipeline(config)
+    sentiments = []
+    
+    for start in range(0, len(texts), SENTIMENT_BATCH_SIZE):
+        chunk = [text[:SENTIMENT_MAX_LENGTH] for text in texts[start:start + SENTIMENT_BATCH_SIZE]]
+        
+        try:
+            if local_pipeline is not None:
+                results = local_pipeline(chunk, truncation=True, batch_size=len(chunk))
+                sentiments.extend(_parse_sentiment_label(item) for item in results)
+                continue
+            
+            def make_request():
+                return HF_SESSION.post(SENTIMENT_API_URL, headers=headers, json={"inputs": chunk}, timeout=HTTP_TIMEOUT)
+            
+            # Use rate limiter (one request per chunk)
+            api_response = throttled_huggingface_request('\x00'.join(chunk), make_request)
+            response = api_response.data
+            
+            if hasattr(response, 'status_code') and response.status_code != 200:
+                print(f"Error from Hugging Face API: {response.text}")
+                sentiments.extend([None] * len(chunk))
+                continue
+            
+            if hasattr(response, 'json'):
+                result = response.json()
+            else:
+                result = response
+            
+            # The response is a list aligned with the inputs
+            if isinstance(result, list) and len(result) == len(chunk):
+                sentiments.extend(_parse_sentiment_label(item) for item in result)
+            else:
+                print(f"Unexpected batch response from Hugging Face API: {result}")
+                sentiments.extend([None] * len(chunk))
+        except Exception as e:
+            print(f"Error analyzing sentiment batch: {e}")
+            sentiments.extend([None] * len(chunk))
+    
+    return sentiments
 
 def categorize_email(email_data, sentiment, config):
-    """Categorize email using OpenAI API with rate limiting."""
+    """Categorize email using OpenAI API with rate limiting.
+    
+    Callers check sender rules first; the trimmed email_data passed here lacks
+    the header flags the rules need.
+    """
     try:
         # Create system message with categorization instructions
         system_message = """You are an email categorization expert. Analyze the email content and categorize it into exactly ONE of the following categories:
@@ -329,7 +559,7 @@ Output only a JSON with the category, for example:
         }
         
         def make_request():
-            return requests.post(api_url, headers=headers, json=data)
+            return OPENAI_SESSION.post(api_url, headers=headers, json=data, timeout=HTTP_TIMEOUT)
         
         # Use rate limiter
         api_response = throttled_openai_request(cache_content, make_request)
@@ -362,7 +592,7 @@ Output only a JSON with the category, for example:
             category_data = json.loads(assistant_response)
             category = category_data.get('category', 'General Inquiries')
             # Verify category is in our list
-            if category not in CATEGORIES:
+            if category not in CATEGORY_SET:
                 print(f"Warning: Category '{category}' not in predefined categories, defaulting to General Inquiries")
                 return "General Inquiries"
             return category
@@ -374,6 +604,98 @@ Output only a JSON with the category, for example:
         print(f"Error categorizing email: {e}")
         return "General Inquiries"
 
+# Combined sentiment + category prompt (used when [OpenAI] combined_sentiment is enabled)
+COMBINED_SYSTEM_MESSAGE = (
+    "You are an email categorization expert. Analyze the email and determine both its "
+    "sentiment and its category.\n\n"
+    "The sentiment must be one of: POSITIVE, NEGATIVE, NEUTRAL.\n\n"
+    "The category must be exactly ONE of the following:\n\n"
+    + "\n".join(f"{i}. {category}" for i, category in enumerate(CATEGORIES, 1))
+    + "\n\nOutput ONLY a JSON object with the fields \"sentiment\" and \"category\"."
+)
+
+SENTIMENT_LABELS = {"POSITIVE", "NEGATIVE", "NEUTRAL"}
+
+def combined_sentiment_enabled(config):
+    """Whether sentiment should come from the categorization call instead of Hugging Face."""
+    try:
+        return config.getboolean('OpenAI', 'combined_sentiment', fallback=False)
+    except (AttributeError, ValueError):
+        return False
+
+def analyze_and_categorize_email(email_data, config):
+    """Get sentiment and category from a single OpenAI call.
+    
+    Falls back to Hugging Face sentiment plus categorize_email if the combined
+    call fails or returns an unusable answer.
+    
+    Returns:
+        Tuple of (sentiment, category); sentiment is None if no API produced one
+    """
+    rule_category = sender_rules.match(email_data, config)
+    if rule_category:
+        return "NEUTRAL", rule_category
+    
+    try:
+        user_message = f"""EMAIL FROM: {email_data['from']}
+EMAIL SUBJECT: {email_data['subject']}
+EMAIL CONTENT: {email_data['content'][:1000]}
+
+Output only a JSON object, for example:
+{{"sentiment": "POSITIVE", "category": "Client Communication"}}"""
+        
+        # Create cache key from email content
+        cache_content = f"combined|{email_data['from']}|{email_data['subject']}|{email_data['content'][:500]}"
+        
+        api_url = "https://api.openai.com/v1/chat/completions"
+        headers = {
+            "Authorization": f"Bearer {config['OpenAI']['api_key']}",
+            "Content-Type": "application/json"
+        }
+        
+        data = {
+            "model": "gpt-3.5-turbo",
+            "messages": [
+                {"role": "system", "content": COMBINED_SYSTEM_MESSAGE},
+                {"role": "user", "content": user_message}
+            ],
+            "temperature": 0.1,
+            "response_format": {"type": "json_object"}
+        }
+        
+        def make_request():
+            return OPENAI_SESSION.post(api_url, headers=headers, json=data, timeout=HTTP_TIMEOUT)
+        
+        # Use rate limiter
+        api_response = throttled_openai_request(cache_content, make_request)
+        response = api_response.data
+        
+        if hasattr(response, 'status_code') and response.status_code != 200:
+            raise ValueError(f"OpenAI API error: {response.text}")
+        
+        if hasattr(response, 'json'):
+            result = response.json()
+        else:
+            result = response
+        
+        assistant_response = result['choices'][0]['message']['content']
+        answer = json.loads(assistant_response)
+        
+        category = answer.get('category')
+        if category not in CATEGORY_SET:
+            raise ValueError(f"category '{category}' not in predefined categories")
+        
+        sentiment = str(answer.get('sentiment', '')).upper()
+        if sentiment not in SENTIMENT_LABELS:
+            sentiment = None
+        
+        return sentiment, category
+    
+    except Exception as e:
+        print(f"Combined categorization failed, falling back to separate calls: {e}")
+        sentiment = _try_analyze_sentiment(email_data.get('text_content') or email_data['content'], config)
+        return sentiment, categorize_email(email_data, sentiment or "NEUTRAL", config)
+
 def move_email_with_retry(mail, uid, target_folder, config):
     """Move an email to the target folder with retry logic and provider-specific handling."""
     # Detect provider for folder path handling
@@ -418,7 +740,7 @@ def move_email_with_retry(mail, uid, target_folder, config):
                         mail.uid('STORE', uid, '+FLAGS', '\\Deleted')
                         
                         # Handle provider-specific expunge behavior
-                        if not provider_config.quirks.get('auto_expunge', True):
+                        if not provider_config.quirks.auto_expunge:
                             mail.expunge()
                         
                         print(f"📁 Email moved to: {folder_path}")
@@ -493,11 +815,14 @@ def move_email(mail, uid, target_folder):
         return False
 
 def safe_imap_operation(mail, operation_func, *args, **kwargs):
-    """Safely execute IMAP operations with retry logic."""
+    """Safely execute IMAP operations, reporting a lost connection as ConnectionError.
+
+    The connection is not probed up front. If the operation fails, the
+    connection is closed and ConnectionError is raised after a backoff delay;
+    callers reconnect with connect_to_mail_server() and retry the operation once.
+    """
     for attempt in range(MAX_RETRY_ATTEMPTS):
         try:
-            # Connection health check
-            mail.noop()
             return operation_func(*args, **kwargs)
         except (imaplib.IMAP4.abort, imaplib.IMAP4.error, ConnectionResetError, BrokenPipeError) as e:
             print(f"IMAP operation failed (attempt {attempt + 1}/{MAX_RETRY_ATTEMPTS}): {e}")
@@ -523,6 +848,46 @@ def safe_imap_operation(mail, operation_func, *args, **kwargs):
     
     raise Exception(f"IMAP operation failed after {MAX_RETRY_ATTEMPTS} attempts")
 
+def fetch_emails_bulk(mail, email_nums, fetch_items='(UID RFC822)', batch_size=FETCH_BATCH_SIZE):
+    """Fetch many messages per IMAP round-trip.
+
+    Args:
+        mail: Connected IMAP client with a mailbox selected
+        email_nums: Message sequence numbers as returned by SEARCH
+        fetch_items: FETCH data items; must include UID and one body item
+        batch_size: Maximum number of messages per FETCH command
+
+    Returns:
+        Dict mapping UID (str) to raw message bytes, in server order
+    """
+    messages = {}
+    
+    for start in range(0, len(email_nums), batch_size):
+        id_set = b','.join(email_nums[start:start + batch_size])
+        result, data = safe_imap_operation(mail, mail.fetch, id_set, fetch_items)
+        if result != 'OK':
+            print(f"Error fetching emails {id_set.decode()}")
+            continue
+        
+        # Each message arrives as a (header, body) tuple; servers may place the
+        # UID either before the body or in the trailing bytes element after it
+        pending_body = None
+        for item in data:
+            if isinstance(item, tuple):
+                match = UID_PATTERN.search(item[0])
+                if match:
+                    messages[match.group(1).decode()] = item[1]
+                    pending_body = None
+                else:
+                    pending_body = item[1]
+            elif pending_body is not None and isinstance(item, bytes):
+                match = UID_PATTERN.search(item)
+                if match:
+                    messages[match.group(1).decode()] = pending_body
+                pending_body = None
+    
+    return messages
+
 def process_emails(config, use_batch_processing=True, batch_size=10):
     """Main function to process emails with connection retry logic and optional batch processing."""
     mail = None
@@ -621,10 +986,24 @@ def _process_emails_batch_mode(mail, email_nums, config, batch_size):
             print("❌ No emails successfully fetched for batch processing")
             return False
         
-        # Process emails in batches
-        batch_results = process_emails_in_batches(
-            emails_data, analyze_sentiment, categorize_email, config, batch_size
-        )
+        # Sender rules settle common senders up front so they never reach the sentiment API
+        batch_results = []
+        api_emails = []
+        for email_data in emails_data:
+            rule_category = sender_rules.match(email_data, config)
+            if rule_category:
+                batch_results.append({'email': email_data, 'sentiment': 'NEUTRAL', 'category': rule_category})
+            else:
+                api_emails.append(email_data)
+        
+        if batch_results:
+            print(f"📐 {len(batch_results)} email(s) matched sender rules")
+        
+        # Process the remaining emails in batches
+        if api_emails:
+            batch_results.extend(process_emails_in_batches(
+                api_emails, analyze_sentiment, categorize_email, config, batch_size
+            ))
         
         # Move emails based on batch results
         success_count = 0
@@ -653,7 +1032,7 @@ def _process_emails_batch_mode(mail, email_nums, config, batch_size):
                     continue
                 
                 # Extract UID from response
-                uid = uid_data[0].decode().split()[2].rstrip(')')
+                uid = UID_PATTERN.search(uid_data[0]).group(1).decode()
                 
                 # Move the email
                 if move_email_with_retry(mail, uid, category, config):
@@ -728,23 +1107,29 @@ def _process_emails_sequential_mode(mail, email_nums, config):
                 if info_parts:
                     print(f"   ℹ️  {', '.join(info_parts)}")
                 
-                # Analyze sentiment (use enhanced content)
-                # For HTML emails, prefer text content for sentiment analysis
-                sentiment_text = email_data.get('text_content') or email_data.get('content')
-                sentiment = analyze_sentiment(sentiment_text, config)
-                
-                # Categorize email (include additional context)
-                enhanced_email_data = {
-                    'from': email_data['from'],
-                    'subject': email_data['subject'],
-                    'content': email_data['content'],
-                    'has_html': email_data.get('has_html', False),
-                    'attachments_count': len(email_data.get('attachments', [])),
-                    'text_content': email_data.get('text_content', ''),
-                    'html_content': email_data.get('html_content', '')
-                }
-                
-                category = categorize_email(enhanced_email_data, sentiment, config)
+                # Sender rules settle common senders without any API call
+                category = sender_rules.match(email_data, config)
+                if category:
+                    sentiment = "NEUTRAL"
+                    print(f"   📐 Matched sender rule: {category}")
+                else:
+                    # Analyze sentiment (use enhanced content)
+                    # For HTML emails, prefer text content for sentiment analysis
+                    sentiment_text = email_data.get('text_content') or email_data.get('content')
+                    sentiment = analyze_sentiment(sentiment_text, config)
+                    
+                    # Categorize email (include additional context)
+                    enhanced_email_data = {
+                        'from': email_data['from'],
+                        'subject': email_data['subject'],
+                        'content': email_data['content'],
+                        'has_html': email_data.get('has_html', False),
+                        'attachments_count': len(email_data.get('attachments', [])),
+                        'text_content': email_data.get('text_content', ''),
+                        'html_content': email_data.get('html_content', '')
+                    }
+                    
+                    category = categorize_email(enhanced_email_data, sentiment, config)
                 
                 # Move email to appropriate folder with retry logic
                 try:
@@ -762,7 +1147,7 @@ def _process_emails_sequential_mode(mail, email_nums, config):
                     continue
                 
                 # Extract UID from response
-                uid = uid_data[0].decode().split()[2].rstrip(')')
+                uid = UID_PATTERN.search(uid_data[0]).group(1).decode()
                 
                 # Move the email
                 if move_email_with_retry(mail, uid, category, config):
@@ -813,7 +1198,8 @@ def test_imap_connection(config):
             return {'status': 'error', 'message': 'Failed to access INBOX'}
         
         # Count emails for info
-        email_count = len(data[0].split()) if data[0] else 0
+        # IDs are space-separated, so count separators instead of building a list
+        email_count = data[0].count(b' ') + 1 if data[0] else 0
         
         # Close connection
         mail.logout()
@@ -15,113 +15,306 @@ import sys
 import json
 import requests
 import configparser
+import socket
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from email.utils import parsedate_to_datetime
 from datetime import datetime, timedelta
 
 # Import all functions from the main script
 from email_categorizer import (
-    load_config, connect_to_mail_server, get_email_content, 
-    analyze_sentiment, categorize_email, move_email_with_retry, CATEGORIES
+    load_config, connect_to_mail_server, fetch_emails_bulk, get_email_content, 
+    analyze_sentiment, analyze_sentiment_batch, categorize_email,
+    analyze_and_categorize_email, combined_sentiment_enabled, move_email_with_retry, CATEGORIES
 )
 from api_rate_limiter import rate_limiter
 from api_monitor import api_monitor
+from classification_cache import classification_cache
+from sender_rules import sender_rules
+
+# Servers may drop IDLE sessions after 30 minutes (RFC 2177), so re-issue before then
+IDLE_TIMEOUT = 29 * 60  # seconds
+
+# Concurrent sentiment/categorization requests per cycle (API rate limits still apply)
+ANALYSIS_WORKERS = 4
+
+def _close_connection(mail):
+    """Log out of the mail server, ignoring errors from a dead connection."""
+    if mail is None:
+        return
+    try:
+        mail.logout()
+    except Exception:
+        pass
+
+def _ensure_connection(mail, config):
+    """Return a live connection with INBOX selected, reconnecting only if needed."""
+    if mail is not None:
+        try:
+            # NOOP keeps the session alive and lets the server report new mail
+            mail.noop()
+            return mail
+        except (imaplib.IMAP4.abort, imaplib.IMAP4.error, OSError) as e:
+            print(f"Mail server connection lost ({e}), reconnecting...")
+            _close_connection(mail)
+    
+    mail = connect_to_mail_server(config)
+    mail.select('INBOX')
+    
+    # Capabilities can change after login, so ask again rather than trusting the greeting
+    result, data = mail.capability()
+    mail._supports_idle = result == 'OK' and b'IDLE' in data[0].upper().split()
+    return mail
+
+def _pop_new_mail_responses(mail):
+    """Pop EXISTS/RECENT responses imaplib buffered outside IDLE.
+    
+    Mail that arrives while a cycle is processing is announced in the responses
+    to other commands and stored in `mail.untagged_responses`, where IDLE never
+    sees it.
+    
+    Returns:
+        True if the server announced messages since the last call
+    """
+    exists = mail.untagged_responses.pop('EXISTS', None)
+    recent = mail.untagged_responses.pop('RECENT', None)
+    # Servers routinely report "* 0 RECENT", which announces nothing
+    return bool(exists) or any(count and int(count) for count in recent or ())
+
+def _idle_wait(mail, timeout=IDLE_TIMEOUT):
+    """Block in IMAP IDLE until the server reports new mail or the timeout expires.
+    
+    Responses are read straight from the socket rather than through imaplib's
+    buffered file, whose state is undefined after a read times out.
+    
+    Returns:
+        True if the server announced new messages, False on timeout
+    """
+    sock = mail.sock
+    command_timeout = sock.gettimeout()
+    # Compressed connections provide their own inflating reader
+    recv = getattr(mail, '_recv', sock.recv)
+    buffer = bytearray()
+    
+    def read_line(deadline=None):
+        while b'\r\n' not in buffer:
+            if deadline is None:
+                sock.settimeout(command_timeout)
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                sock.settimeout(remaining)
+            try:
+                chunk = recv(4096)
+            except socket.timeout:
+                if deadline is None:
+                    raise
+                return None
+            if not chunk:
+                raise imaplib.IMAP4.abort("Connection closed during IDLE")
+            buffer.extend(chunk)
+        line, _, rest = bytes(buffer).partition(b'\r\n')
+        buffer[:] = rest
+        return line
+    
+    tag = mail._new_tag()
+    try:
+        mail.send(tag + b' IDLE\r\n')
+        response = read_line()
+        if not response.startswith(b'+'):
+            raise imaplib.IMAP4.error(f"IDLE rejected by server: {response.decode(errors='replace')}")
+        
+        has_new_mail = False
+        deadline = time.monotonic() + timeout
+        while True:
+            line = read_line(deadline)
+            if line is None:
+                break
+            if line.startswith(b'* ') and line.endswith((b'EXISTS', b'RECENT')):
+                has_new_mail = True
+                break
+        
+        # Leave IDLE and drain responses up to the tagged completion; mail can
+        # still be announced between the timeout and the server seeing DONE
+        mail.send(b'DONE\r\n')
+        while True:
+            line = read_line()
+            if line.startswith(tag):
+                break
+            if line.startswith(b'* ') and line.endswith((b'EXISTS', b'RECENT')):
+                has_new_mail = True
+    finally:
+        sock.settimeout(command_timeout)
+    
+    return has_new_mail
+
+def _categorize_with_sentiment(email_data, sentiment, config):
+    """Categorize an email whose sentiment is already known (None if its analysis failed)."""
+    return sentiment, categorize_email(email_data, sentiment or "NEUTRAL", config)
+
+def _move_and_report(mail, uid, email_data, sentiment, category, config, source=None):
+    """Move a classified email and print the outcome."""
+    source_info = f" [{source}]" if source else ""
+    print(f"Processing email: {email_data['subject']}")
+    print(f"Sentiment: {sentiment}")
+    print(f"Category: {category}{source_info}")
+    
+    # Move the email with retry logic
+    if move_email_with_retry(mail, uid, category, config):
+        print(f"✅ Successfully moved email to {category}")
+        
+        # Enhanced logging
+        if email_data.get('has_html'):
+            print(f"   📧 HTML email processed")
+        if email_data.get('attachments'):
+            print(f"   📎 {len(email_data['attachments'])} attachment(s)")
+    else:
+        print(f"❌ Failed to move email to {category}")
 
 def monitor_emails(config, check_interval=60):
-    """Continuously monitor emails and process them as they arrive."""
+    """Continuously monitor emails and process them as they arrive.
+    
+    Uses IMAP IDLE to wait for new mail when the server supports it, and falls
+    back to polling every `check_interval` seconds otherwise.
+    """
     print(f"Starting continuous email monitoring (checking every {check_interval} seconds)...")
     
     cycle_count = 0
     last_report_time = datetime.now()
+    mail = None
     
-    while True:
-        try:
-            cycle_count += 1
-            current_time = datetime.now()
-            print(f"\n[{current_time.strftime('%Y-%m-%d %H:%M:%S')}] Checking for new emails... (Cycle {cycle_count})")
-            
-            mail = connect_to_mail_server(config)
-            mail.select('INBOX')
-            
-            # Search for unread emails
-            result, data = mail.search(None, 'UNSEEN')
-            if result != 'OK':
-                print("No emails found or error in search")
-                mail.logout()
-                time.sleep(check_interval)
-                continue
-            
-            email_count = len(data[0].split())
-            if email_count == 0:
-                print("No new emails found")
-            else:
-                print(f"Found {email_count} new email(s)")
+    try:
+        while True:
+            try:
+                cycle_count += 1
+                current_time = datetime.now()
+                print(f"\n[{current_time.strftime('%Y-%m-%d %H:%M:%S')}] Checking for new emails... (Cycle {cycle_count})")
                 
-                for num in data[0].split():
-                    try:
-                        # Fetch the email
-                        result, msg_data = mail.fetch(num, '(RFC822)')
-                        if result != 'OK':
-                            print(f"Error fetching email {num}")
-                            continue
-                        
-                        # Parse the email
-                        msg = email.message_from_bytes(msg_data[0][1])
-                        email_data = get_email_content(msg)
-                        
-                        print(f"Processing email: {email_data['subject']}")
-                        
-                        # Analyze sentiment
-                        sentiment = analyze_sentiment(email_data['content'], config)
-                        print(f"Sentiment: {sentiment}")
-                        
-                        # Categorize email
-                        category = categorize_email(email_data, sentiment, config)
-                        print(f"Category: {category}")
-                        
-                        # Move email to appropriate folder
-                        result, uid_data = mail.fetch(num, '(UID)')
-                        if result != 'OK':
-                            print(f"Error fetching UID for email {num}")
+                mail = _ensure_connection(mail, config)
+                
+                # The search below covers anything announced so far
+                _pop_new_mail_responses(mail)
+                
+                # Search for unread emails
+                result, data = mail.search(None, 'UNSEEN')
+                if result != 'OK':
+                    print("No emails found or error in search")
+                    time.sleep(check_interval)
+                    continue
+                
+                email_nums = data[0].split()
+                if not email_nums:
+                    print("No new emails found")
+                else:
+                    print(f"Found {len(email_nums)} new email(s)")
+                    
+                    # Fetch all messages (with UIDs) in as few round-trips as possible
+                    messages = fetch_emails_bulk(mail, email_nums)
+                    
+                    # Parse everything up front so sentiment can be scored in one batch
+                    parsed_emails = {}
+                    for uid, raw_email in messages.items():
+                        try:
+                            msg = email.message_from_bytes(raw_email)
+                            parsed_emails[uid] = get_email_content(msg)
+                        except Exception as e:
+                            print(f"Error parsing email: {e}")
+                    
+                    # Sender rules and previously seen templated emails skip the APIs
+                    known_results = {}
+                    pending_emails = {}
+                    for uid, email_data in parsed_emails.items():
+                        rule_category = sender_rules.match(email_data, config)
+                        if rule_category:
+                            known_results[uid] = ("NEUTRAL", rule_category, "Rule")
                             continue
-                        
-                        # Extract UID from response
-                        uid = uid_data[0].decode().split()[2].rstrip(')')
-                        
-                        # Move the email with retry logic
-                        if move_email_with_retry(mail, uid, category, config):
-                            print(f"✅ Successfully moved email to {category}")
-                            
-                            # Enhanced logging
-                            if email_data.get('has_html'):
-                                print(f"   📧 HTML email processed")
-                            if email_data.get('attachments'):
-                                print(f"   📎 {len(email_data['attachments'])} attachment(s)")
+                        cached = classification_cache.get(email_data)
+                        if cached:
+                            known_results[uid] = (*cached, "Cached")
                         else:
-                            print(f"❌ Failed to move email to {category}")
-                            
-                    except Exception as e:
-                        print(f"Error processing email: {e}")
-            
-            mail.logout()
-            
-            # Log usage statistics every hour
-            if (current_time - last_report_time).total_seconds() >= 3600:  # 1 hour
-                print("\n" + "="*50)
-                print("HOURLY USAGE REPORT")
-                print("="*50)
-                rate_limiter.print_usage_report()
-                api_monitor.print_alerts()
-                api_monitor.log_usage()
-                last_report_time = current_time
-                print("="*50)
+                            pending_emails[uid] = email_data
+                    
+                    for uid, (sentiment, category, source) in known_results.items():
+                        try:
+                            _move_and_report(mail, uid, parsed_emails[uid], sentiment, category, config, source=source)
+                        except Exception as e:
+                            print(f"Error processing email: {e}")
+                    
+                    # Sentiment comes either from one batched Hugging Face request
+                    # or from the categorization call itself
+                    combined = combined_sentiment_enabled(config)
+                    if combined:
+                        sentiments = [None] * len(pending_emails)
+                    else:
+                        sentiments = analyze_sentiment_batch(
+                            [email_data['content'] for email_data in pending_emails.values()], config
+                        )
+                    
+                    # Categorization is network-bound, so run it concurrently;
+                    # moves stay sequential on the single IMAP connection
+                    with ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS) as executor:
+                        future_to_uid = {}
+                        for (uid, email_data), sentiment in zip(pending_emails.items(), sentiments):
+                            if combined:
+                                future = executor.submit(analyze_and_categorize_email, email_data, config)
+                            else:
+                                future = executor.submit(_categorize_with_sentiment, email_data, sentiment, config)
+                            future_to_uid[future] = uid
+                        
+                        for future in as_completed(future_to_uid):
+                            uid = future_to_uid[future]
+                            email_data = pending_emails[uid]
+                            try:
+                                sentiment, category = future.result()
+                                # Only cache answers both APIs actually gave: a failed sentiment
+                                # analysis comes back as None, and the fallback category is
+                                # also what categorization errors return
+                                if sentiment is not None and category != "General Inquiries":
+                                    classification_cache.put(email_data, sentiment, category)
+                                sentiment = sentiment or "NEUTRAL"
+                                _move_and_report(mail, uid, email_data, sentiment, category, config)
+                            except Exception as e:
+                                print(f"Error processing email: {e}")
+                    
+                    classification_cache.save()
+                
+                # Log usage statistics every hour
+                if (current_time - last_report_time).total_seconds() >= 3600:  # 1 hour
+                    print("\n" + "="*50)
+                    print("HOURLY USAGE REPORT")
+                    print("="*50)
+                    rate_limiter.print_usage_report()
+                    api_monitor.print_alerts()
+                    api_monitor.log_usage()
+                    last_report_time = current_time
+                    print("="*50)
+                
+            except Exception as e:
+                print(f"Error in monitoring loop: {e}")
+                api_monitor.log_usage()  # Log usage even on errors
+                
+                # Drop the connection so the next cycle starts from a clean one
+                _close_connection(mail)
+                mail = None
             
-        except Exception as e:
-            print(f"Error in monitoring loop: {e}")
-            api_monitor.log_usage()  # Log usage even on errors
-        
-        print(f"Waiting {check_interval} seconds before next check...")
-        time.sleep(check_interval)
+            if mail is not None and _pop_new_mail_responses(mail):
+                # New mail arrived mid-cycle; process it now instead of waiting for the next one
+                print("New emails arrived during processing, checking again...")
+            elif mail is not None and getattr(mail, '_supports_idle', False):
+                print("Waiting for new emails (IMAP IDLE)...")
+                try:
+                    _idle_wait(mail)
+                except (imaplib.IMAP4.abort, imaplib.IMAP4.error, OSError) as e:
+                    print(f"IDLE failed ({e}), reconnecting in {check_interval} seconds...")
+                    _close_connection(mail)
+                    mail = None
+                    time.sleep(check_interval)
+            else:
+                print(f"Waiting {check_interval} seconds before next check...")
+                time.sleep(check_interval)
+    finally:
+        _close_connection(mail)
 
 if __name__ == "__main__":
     config = load_config()
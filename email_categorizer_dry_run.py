@@ -9,18 +9,67 @@ categorization would be applied WITHOUT actually moving any emails.
 import imaplib
 import email
 import email.header
+import email.parser
+import email.policy
 import os
 import sys
 import json
+import re
+import hashlib
+import sqlite3
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import configparser
+import functools
+import atexit
+import threading
 import time
 import random
+from concurrent.futures import ThreadPoolExecutor
 from email.utils import parsedate_to_datetime
 from datetime import datetime, timedelta
+from sender_rules import sender_rules, rule_headers
+from api_rate_limiter import rate_limiter
 
 # Configuration constants
 CONFIG_FILE = 'config.ini'
+FETCH_BATCH_SIZE = 100  # messages per FETCH command
+FETCH_BODY_BYTES = 8192  # body bytes downloaded per message (headers are always complete)
+SENTIMENT_BATCH_SIZE = 32  # texts per HuggingFace request
+CATEGORIZE_WORKERS = 4  # emails analyzed concurrently
+HTTP_TIMEOUT = (5, 30)  # (connect, read) seconds for API requests
+SENTIMENT_MAX_LENGTH = 1000  # body characters sent for sentiment analysis
+PROMPT_BODY_LENGTH = 500  # body characters included in OpenAI prompts
+BODY_DECODE_BYTES = 4000  # decoded body prefix; covers the 1000 characters the APIs ever see
+SENTIMENT_API_URL = "https://api-inference.huggingface.co/models/distilbert-base-uncased-finetuned-sst-2-english"
+OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
+
+UID_PATTERN = re.compile(rb'UID (\d+)')
+MESSAGE_START_PATTERN = re.compile(rb'^\d+ \(')
+ENCODED_WORD_PATTERN = re.compile(r'=\?[^?]+\?[BbQq]\?[^?]*\?=')
+
+# Reusable parsers; the header parser stops at the blank line ending the headers
+HEADER_PARSER = email.parser.BytesHeaderParser(policy=email.policy.compat32)
+MESSAGE_PARSER = email.parser.BytesParser(policy=email.policy.compat32)
+
+# Logged-in IMAP connections kept between runs, keyed by (server, port, username)
+IMAP_POOL = {}
+IMAP_POOL_LOCK = threading.Lock()
+
+# Reuse TLS connections across emails instead of reconnecting for every request.
+# Pacing is driven by the APIs themselves: 429 and transient 5xx responses are
+# retried after the server's Retry-After (or an exponential backoff) instead of
+# sleeping blindly.
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount('https://', HTTPAdapter(max_retries=Retry(
+    total=3,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=frozenset(['POST']),
+    backoff_factor=2,
+    respect_retry_after_header=True,
+    raise_on_status=False
+)))
 
 CATEGORIES = [
     "Client Communication",
@@ -37,31 +86,155 @@ CATEGORIES = [
     "Urgent & Time-Sensitive"
 ]
 
+# Lowercased category names for validating model replies
+CATEGORY_LOOKUP = {category.lower(): category for category in CATEGORIES}
+
+# Categorization prompt. Everything constant lives in the system message so the
+# prompt prefix is byte-identical across calls (and eligible for prompt caching);
+# only the per-email details go in the user message.
+CATEGORY_SYSTEM_MESSAGE = (
+    "You are an AI assistant that categorizes emails for a business.\n\n"
+    "Categories available:\n" + ', '.join(CATEGORIES) + "\n\n"
+    "Categorize each email into ONE of the above categories. "
+    "Consider the sender, subject, content, and sentiment.\n\n"
+    "Respond with ONLY the category name, nothing else."
+)
+CATEGORY_PROMPT_TEMPLATE = """Subject: {subject}
+From: {sender}
+Sentiment: {sentiment_label} (Score: {sentiment_score})
+Body: {body}"""
+
+class PersistentCache:
+    """SQLite-backed cache of API results, shared by worker threads and concurrent runs
+    
+    Entries older than `ttl_seconds` are ignored and pruned when the cache is opened.
+    """
+    
+    def __init__(self, path, table, ttl_seconds):
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.conn = None
+        self.lock = threading.Lock()
+    
+    def _connect(self):
+        """Open the database on first use (call with the lock held)"""
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            # WAL lets several dry runs read and write the cache at the same time
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, ts INTEGER NOT NULL)"
+            )
+            conn.execute(f"DELETE FROM {self.table} WHERE ts < ?", (int(time.time()) - self.ttl_seconds,))
+            self.conn = conn
+        return self.conn
+    
+    def get(self, key):
+        try:
+            with self.lock:
+                row = self._connect().execute(
+                    f"SELECT value FROM {self.table} WHERE key = ? AND ts >= ?",
+                    (key, int(time.time()) - self.ttl_seconds)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading cache {self.path}: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+    
+    def put(self, key, value):
+        try:
+            with self.lock:
+                self._connect().execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, ts) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), int(time.time()))
+                )
+        except sqlite3.Error as e:
+            print(f"Error writing cache {self.path}: {e}")
+
+# Sentiment keyed by a hash of the analyzed text, category by a normalized
+# (sender, subject, body prefix, sentiment) key so replies and numbered variants also hit.
+# Sentiment of identical text never changes; categories are re-checked monthly.
+CACHE_DB_FILE = os.path.join('data', 'dry_run_cache.db')
+SENTIMENT_CACHE = PersistentCache(CACHE_DB_FILE, 'sentiment_cache', ttl_seconds=90 * 86400)
+CATEGORY_CACHE = PersistentCache(CACHE_DB_FILE, 'category_cache', ttl_seconds=30 * 86400)
+
+SUBJECT_PREFIX_PATTERN = re.compile(r'^(?:\s*(?:re|fwd?|aw|wg)\s*:)+\s*', re.IGNORECASE)
+DIGITS_PATTERN = re.compile(r'\d+')
+
+def _sentiment_cache_key(text):
+    """Hash the (already truncated) text sent for sentiment analysis"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+def _category_cache_key(email_content, sentiment):
+    """Key on the sender, the subject without reply prefixes, and the body prefix the model sees
+    
+    Numbers are masked in the subject and body so templated variants share a key.
+    """
+    subject = SUBJECT_PREFIX_PATTERN.sub('', email_content.get('subject', '').lower())
+    subject = ' '.join(DIGITS_PATTERN.sub('0', subject).split())
+    body = email_content.get('body', 'No body')[:PROMPT_BODY_LENGTH].lower()
+    body = ' '.join(DIGITS_PATTERN.sub('0', body).split())
+    key_source = '\x00'.join([
+        email_content.get('from', '').lower(),
+        subject,
+        body,
+        sentiment.get('label', 'NEUTRAL')
+    ])
+    return hashlib.blake2b(key_source.encode('utf-8'), digest_size=16).hexdigest()
+
+@functools.lru_cache(maxsize=1)
 def load_config():
-    """Load configuration from config.ini file"""
+    """Load configuration from config.ini file (parsed once per run)"""
     config = configparser.ConfigParser()
     config.read(CONFIG_FILE)
     return config
 
+def _post_api(api_name, url, headers, payload):
+    """POST to an API while holding a slot of its shared adaptive concurrency limit
+    
+    The session retries 429s itself, so throttling is read from the retry
+    history as well as the final status; either one halves the limit.
+    """
+    controller = rate_limiter.get_concurrency_controller(api_name)
+    with controller.slot():
+        response = HTTP_SESSION.post(url, headers=headers, json=payload, timeout=HTTP_TIMEOUT)
+    
+    retries = getattr(response.raw, 'retries', None)
+    throttled = response.status_code == 429 or any(
+        attempt.status == 429 for attempt in (retries.history if retries else ())
+    )
+    if throttled:
+        controller.on_throttle()
+    elif response.status_code == 200:
+        controller.on_success()
+    return response
+
 def get_sentiment_analysis(text):
     """Get sentiment analysis from HuggingFace API"""
+    # Truncate once; the same string is hashed for the cache and sent to the API
+    text = text[:SENTIMENT_MAX_LENGTH]
+    key = _sentiment_cache_key(text)
+    cached = SENTIMENT_CACHE.get(key)
+    if cached:
+        return cached
+    
     config = load_config()
     api_key = config['Hugging Face']['api_key']
     
-    # Truncate text to avoid API limits
-    text = text[:1000] if len(text) > 1000 else text
-    
     headers = {"Authorization": f"Bearer {api_key}"}
     
-    API_URL = "https://api-inference.huggingface.co/models/distilbert-base-uncased-finetuned-sst-2-english"
-    
     try:
-        response = requests.post(API_URL, headers=headers, json={"inputs": text})
+        response = _post_api('huggingface', SENTIMENT_API_URL, headers, {"inputs": text})
         result = response.json()
         
         if isinstance(result, list) and len(result) > 0:
             sentiment_scores = result[0]
             if isinstance(sentiment_scores, list) and len(sentiment_scores) > 0:
+                SENTIMENT_CACHE.put(key, sentiment_scores[0])
                 return sentiment_scores[0]
         
         return {"label": "NEUTRAL", "score": 0.5}
@@ -70,8 +243,51 @@ def get_sentiment_analysis(text):
         print(f"Error in sentiment analysis: {e}")
         return {"label": "NEUTRAL", "score": 0.5}
 
+def get_sentiment_analysis_batch(texts):
+    """Get sentiment analysis for many texts with one HuggingFace request per chunk
+    
+    Bodies seen before (repeated templates, re-runs) are answered from the cache.
+    """
+    config = load_config()
+    api_key = config['Hugging Face']['api_key']
+    headers = {"Authorization": f"Bearer {api_key}"}
+    neutral = {"label": "NEUTRAL", "score": 0.5}
+    
+    # Truncate once; the same strings are hashed for the cache and sent to the API
+    texts = [text[:SENTIMENT_MAX_LENGTH] for text in texts]
+    keys = [_sentiment_cache_key(text) for text in texts]
+    sentiments = [SENTIMENT_CACHE.get(key) for key in keys]
+    misses = [i for i, sentiment in enumerate(sentiments) if sentiment is None]
+    
+    for start in range(0, len(misses), SENTIMENT_BATCH_SIZE):
+        indices = misses[start:start + SENTIMENT_BATCH_SIZE]
+        chunk = [texts[i] for i in indices]
+        
+        try:
+            response = _post_api('huggingface', SENTIMENT_API_URL, headers, {"inputs": chunk})
+            result = response.json()
+            
+            # One entry per input, each a list of scores sorted best-first
+            if isinstance(result, list) and len(result) == len(chunk):
+                for i, sentiment_scores in zip(indices, result):
+                    if isinstance(sentiment_scores, list) and len(sentiment_scores) > 0:
+                        sentiments[i] = sentiment_scores[0]
+                        SENTIMENT_CACHE.put(keys[i], sentiment_scores[0])
+                continue
+            
+            print(f"Unexpected sentiment analysis response: {result}")
+        except Exception as e:
+            print(f"Error in sentiment analysis: {e}")
+    
+    return [sentiment or neutral for sentiment in sentiments]
+
 def categorize_email_with_openai(email_content, sentiment):
     """Categorize email using OpenAI API"""
+    key = _category_cache_key(email_content, sentiment)
+    cached = CATEGORY_CACHE.get(key)
+    if cached:
+        return cached
+    
     config = load_config()
     api_key = config['OpenAI']['api_key']
     
@@ -80,29 +296,18 @@ def categorize_email_with_openai(email_content, sentiment):
         "Content-Type": "application/json"
     }
     
-    prompt = f"""
-    You are an AI assistant that categorizes emails for a business. 
-    
-    Email Content:
-    Subject: {email_content.get('subject', 'No subject')}
-    From: {email_content.get('from', 'Unknown sender')}
-    Body: {email_content.get('body', 'No body')[:500]}
-    
-    Sentiment Analysis: {sentiment.get('label', 'NEUTRAL')} (Score: {sentiment.get('score', 0.5)})
-    
-    Categories available:
-    {', '.join(CATEGORIES)}
-    
-    Please categorize this email into ONE of the above categories. 
-    Consider the sender, subject, content, and sentiment.
-    
-    Respond with ONLY the category name, nothing else.
-    """
+    prompt = CATEGORY_PROMPT_TEMPLATE.format(
+        subject=email_content.get('subject', 'No subject'),
+        sender=email_content.get('from', 'Unknown sender'),
+        body=email_content.get('body', 'No body')[:PROMPT_BODY_LENGTH],
+        sentiment_label=sentiment.get('label', 'NEUTRAL'),
+        sentiment_score=sentiment.get('score', 0.5)
+    )
     
     data = {
         "model": "gpt-3.5-turbo",
         "messages": [
-            {"role": "system", "content": "You are an email categorization assistant. Respond with only the category name."},
+            {"role": "system", "content": CATEGORY_SYSTEM_MESSAGE},
             {"role": "user", "content": prompt}
         ],
         "temperature": 0.1,
@@ -110,20 +315,22 @@ def categorize_email_with_openai(email_content, sentiment):
     }
     
     try:
-        response = requests.post("https://api.openai.com/v1/chat/completions", 
-                               headers=headers, json=data)
+        response = _post_api('openai', OPENAI_API_URL, headers, data)
         result = response.json()
         
         if 'choices' in result and len(result['choices']) > 0:
             category = result['choices'][0]['message']['content'].strip()
-            # Validate category
-            if category in CATEGORIES:
-                return category
-            else:
-                # Try to find a partial match
-                for cat in CATEGORIES:
-                    if cat.lower() in category.lower() or category.lower() in cat.lower():
-                        return cat
+            # Validate category (case-insensitive exact match first)
+            category_lower = category.lower()
+            if category_lower in CATEGORY_LOOKUP:
+                CATEGORY_CACHE.put(key, CATEGORY_LOOKUP[category_lower])
+                return CATEGORY_LOOKUP[category_lower]
+            
+            # Try to find a partial match (an empty reply would match everything)
+            for cat_lower, cat in CATEGORY_LOOKUP.items():
+                if category_lower and (cat_lower in category_lower or category_lower in cat_lower):
+                    CATEGORY_CACHE.put(key, cat)
+                    return cat
         
         return "General Inquiries"  # Default fallback
         
@@ -131,64 +338,265 @@ def categorize_email_with_openai(email_content, sentiment):
         print(f"Error in OpenAI categorization: {e}")
         return "General Inquiries"
 
+COMBINED_SYSTEM_MESSAGE = (
+    "You are an email categorization expert. Analyze the email and determine both its "
+    "sentiment and its category.\n\n"
+    "The sentiment must be one of: POSITIVE, NEGATIVE, NEUTRAL.\n\n"
+    "The category must be exactly ONE of: " + ', '.join(CATEGORIES) + "\n\n"
+    "Output ONLY a JSON object with the fields \"sentiment\" and \"category\"."
+)
+
+def analyze_email_with_openai(email_content):
+    """Get sentiment and category from a single OpenAI call, or None on failure"""
+    config = load_config()
+    api_key = config['OpenAI']['api_key']
+    
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    
+    user_message = (
+        f"Subject: {email_content.get('subject', 'No subject')}\n"
+        f"From: {email_content.get('from', 'Unknown sender')}\n"
+        f"Body: {email_content.get('body', 'No body')[:PROMPT_BODY_LENGTH]}"
+    )
+    
+    data = {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {"role": "system", "content": COMBINED_SYSTEM_MESSAGE},
+            {"role": "user", "content": user_message}
+        ],
+        "temperature": 0.1,
+        "max_tokens": 50,
+        "response_format": {"type": "json_object"}
+    }
+    
+    try:
+        response = _post_api('openai', OPENAI_API_URL, headers, data)
+        result = response.json()
+        reply = json.loads(result['choices'][0]['message']['content'])
+        
+        label = str(reply.get('sentiment', '')).upper()
+        category = CATEGORY_LOOKUP.get(str(reply.get('category', '')).strip().lower())
+        if label not in ("POSITIVE", "NEGATIVE", "NEUTRAL") or category is None:
+            return None
+        
+        # The model gives no confidence, so report a fixed score
+        return {"label": label, "score": 1.0}, category
+        
+    except Exception as e:
+        print(f"Error in combined OpenAI analysis: {e}")
+        return None
+
+def classify_email(email_content, sentiment=None, rule_category=None, combined=False):
+    """Work out the sentiment and category for one email (safe to run in a worker thread)
+    
+    Returns:
+        Tuple of (sentiment dict, category, note describing a shortcut or None)
+    """
+    if rule_category:
+        return {"label": "NEUTRAL", "score": 0.5}, rule_category, "📐 Matched sender rule"
+    
+    if combined:
+        analysis = analyze_email_with_openai(email_content)
+        if analysis:
+            return analysis[0], analysis[1], "🎯 Sentiment and category from one OpenAI call"
+        sentiment = get_sentiment_analysis(email_content['body'])
+    
+    return sentiment, categorize_email_with_openai(email_content, sentiment), None
+
 def decode_header_value(header_value):
     """Decode email header values"""
     if header_value is None:
         return ""
     
-    decoded_parts = email.header.decode_header(header_value)
-    decoded_string = ""
+    # Plain headers carry no RFC 2047 encoded-words, so there is nothing to decode
+    if isinstance(header_value, str) and not ENCODED_WORD_PATTERN.search(header_value):
+        return header_value
     
-    for part, encoding in decoded_parts:
+    decoded_parts = []
+    for part, encoding in email.header.decode_header(header_value):
         if isinstance(part, bytes):
             if encoding:
                 try:
-                    decoded_string += part.decode(encoding)
+                    decoded_parts.append(part.decode(encoding))
                 except (UnicodeDecodeError, LookupError):
-                    decoded_string += part.decode('utf-8', errors='ignore')
+                    decoded_parts.append(part.decode('utf-8', errors='ignore'))
             else:
-                decoded_string += part.decode('utf-8', errors='ignore')
+                decoded_parts.append(part.decode('utf-8', errors='ignore'))
         else:
-            decoded_string += str(part)
+            decoded_parts.append(str(part))
     
-    return decoded_string
+    return "".join(decoded_parts)
 
-def extract_email_content(msg):
-    """Extract content from email message"""
-    content = {
+def extract_email_headers(msg):
+    """Extract the header fields from an email message (body left empty)"""
+    return {
         'subject': decode_header_value(msg.get('Subject', '')),
         'from': decode_header_value(msg.get('From', '')),
         'to': decode_header_value(msg.get('To', '')),
         'date': msg.get('Date', ''),
+        **rule_headers(msg),
         'body': ''
     }
+
+def _first_text_plain(msg):
+    """Find the first text/plain part depth-first, in the same order as walk()
     
+    Only the root of a multipart/related is searched (the remaining parts are
+    inline images and other resources), and attached messages are skipped.
+    """
+    stack = [msg]
+    while stack:
+        part = stack.pop()
+        content_type = part.get_content_type()
+        if content_type == "text/plain":
+            return part
+        if content_type.startswith("multipart/"):
+            subparts = part.get_payload()
+            if content_type == "multipart/related":
+                subparts = subparts[:1]
+            stack.extend(reversed(subparts))
+    return None
+
+def extract_email_body(msg):
+    """Extract the start of the first text/plain part of an email message"""
+    # Use the first text/plain part
     if msg.is_multipart():
-        for part in msg.walk():
-            if part.get_content_type() == "text/plain":
-                try:
-                    body = part.get_payload(decode=True)
-                    if isinstance(body, bytes):
-                        content['body'] = body.decode('utf-8', errors='ignore')
-                    else:
-                        content['body'] = str(body)
-                    break
-                except Exception as e:
-                    print(f"Error decoding email body: {e}")
-                    content['body'] = "Error decoding email content"
+        part = _first_text_plain(msg)
     else:
-        try:
-            body = msg.get_payload(decode=True)
-            if isinstance(body, bytes):
-                content['body'] = body.decode('utf-8', errors='ignore')
-            else:
-                content['body'] = str(body)
-        except Exception as e:
-            print(f"Error decoding email body: {e}")
-            content['body'] = "Error decoding email content"
+        part = msg
     
+    if part is None:
+        return ''
+    
+    try:
+        body = part.get_payload(decode=True)
+        if isinstance(body, bytes):
+            # Decode only the prefix that previews and API calls use
+            return body[:BODY_DECODE_BYTES].decode('utf-8', errors='ignore')
+        return str(body)
+    except Exception as e:
+        print(f"Error decoding email body: {e}")
+        return "Error decoding email content"
+
+def extract_email_content(msg):
+    """Extract content from email message"""
+    content = extract_email_headers(msg)
+    content['body'] = extract_email_body(msg)
     return content
 
+def _optimize_sequence(email_ids):
+    """Collapse message numbers into an IMAP sequence set, e.g. [1, 2, 3, 7] -> b'1:3,7'"""
+    numbers = sorted(int(email_id) for email_id in email_ids)
+    ranges = []
+    for number in numbers:
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    
+    return b','.join(
+        str(low).encode() if low == high else f"{low}:{high}".encode()
+        for low, high in ranges
+    )
+
+def fetch_emails_bulk(mail, email_ids, batch_size=FETCH_BATCH_SIZE):
+    """Fetch message headers and the start of each body without marking them as read.
+    
+    Only the first FETCH_BODY_BYTES of the body are downloaded, which covers
+    everything the preview uses while skipping large attachments.
+    
+    Returns:
+        Dict mapping UID (str) to raw (possibly truncated) message bytes, in server order
+    """
+    fetch_items = f'(UID BODY.PEEK[HEADER] BODY.PEEK[TEXT]<0.{FETCH_BODY_BYTES}>)'
+    messages = {}
+    
+    for start in range(0, len(email_ids), batch_size):
+        id_set = _optimize_sequence(email_ids[start:start + batch_size])
+        result, data = mail.fetch(id_set, fetch_items)
+        if result != 'OK':
+            print(f"❌ Error fetching emails {id_set.decode()}")
+            continue
+        
+        # Each message spans one (prefix, literal) tuple per body section; the
+        # UID may appear in any prefix or in the trailing bytes element
+        entries = []
+        for item in data:
+            if isinstance(item, tuple):
+                prefix, payload = item
+                if MESSAGE_START_PATTERN.match(prefix) or not entries:
+                    entries.append({'uid': None, 'parts': []})
+                entries[-1]['parts'].append(payload)
+            elif isinstance(item, bytes) and entries:
+                prefix = item
+            else:
+                continue
+            
+            match = UID_PATTERN.search(prefix)
+            if match and entries[-1]['uid'] is None:
+                entries[-1]['uid'] = match.group(1).decode()
+        
+        # The header section ends with a blank line, so header + text is a valid message
+        for entry in entries:
+            if entry['uid'] is not None:
+                messages[entry['uid']] = b''.join(entry['parts'])
+    
+    return messages
+
+def get_imap_connection(config):
+    """Return a logged-in IMAP connection, reusing a pooled one while it is alive"""
+    server = config['IMAP']['server']
+    port = int(config['IMAP']['port'])
+    username = config['IMAP']['username']
+    key = (server, port, username)
+    
+    with IMAP_POOL_LOCK:
+        mail = IMAP_POOL.pop(key, None)
+    
+    if mail is not None:
+        try:
+            result, _ = mail.noop()
+            if result == 'OK':
+                print(f"♻️  Reusing connection to {server}:{port}")
+                return mail
+        except (imaplib.IMAP4.abort, imaplib.IMAP4.error, OSError):
+            pass
+        _logout_quietly(mail)
+    
+    print(f"🔗 Connecting to {server}:{port}...")
+    mail = imaplib.IMAP4_SSL(server, port)
+    mail.login(username, config['IMAP']['password'])
+    print(f"✅ Successfully logged in as {username}")
+    return mail
+
+def release_imap_connection(config, mail):
+    """Return a connection to the pool for the next run"""
+    key = (config['IMAP']['server'], int(config['IMAP']['port']), config['IMAP']['username'])
+    with IMAP_POOL_LOCK:
+        previous = IMAP_POOL.get(key)
+        IMAP_POOL[key] = mail
+    if previous is not None and previous is not mail:
+        _logout_quietly(previous)
+
+def _logout_quietly(mail):
+    try:
+        mail.logout()
+    except Exception:
+        pass
+
+@atexit.register
+def _close_pooled_connections():
+    """Log out of pooled connections when the interpreter exits"""
+    with IMAP_POOL_LOCK:
+        connections = list(IMAP_POOL.values())
+        IMAP_POOL.clear()
+    for mail in connections:
+        _logout_quietly(mail)
+
 def dry_run_categorization(email_filter='UNSEEN', max_emails=10):
     """Perform dry run categorization - show what would happen without moving emails
     
@@ -197,17 +605,11 @@ def dry_run_categorization(email_filter='UNSEEN', max_emails=10):
         max_emails: Maximum number of emails to process
     """
     config = load_config()
-    
-    server = config['IMAP']['server']
-    port = int(config['IMAP']['port'])
-    username = config['IMAP']['username']
-    password = config['IMAP']['password']
+    mail = None
+    failed = False
     
     try:
-        print(f"🔗 Connecting to {server}:{port}...")
-        mail = imaplib.IMAP4_SSL(server, port)
-        mail.login(username, password)
-        print(f"✅ Successfully logged in as {username}")
+        mail = get_imap_connection(config)
         
         # Select INBOX
         mail.select('INBOX')
@@ -221,71 +623,100 @@ def dry_run_categorization(email_filter='UNSEEN', max_emails=10):
             return
         
         email_ids = data[0].split()
+        email_count = len(email_ids)
         
         if not email_ids:
             print(f"📭 No emails found matching filter: {email_filter}")
-            mail.logout()
             return
         
         # Limit number of emails to process
-        if len(email_ids) > max_emails:
+        if email_count > max_emails:
             email_ids = email_ids[-max_emails:]  # Get most recent emails
-            print(f"📧 Found {len(data[0].split())} emails, processing most recent {max_emails}")
+            print(f"📧 Found {email_count} emails, processing most recent {max_emails}")
         else:
-            print(f"📧 Found {len(email_ids)} email(s) matching filter")
+            print(f"📧 Found {email_count} email(s) matching filter")
         
         print("=" * 80)
         
-        for i, email_id in enumerate(email_ids, 1):
+        # Fetch all selected emails in as few round-trips as possible
+        messages = fetch_emails_bulk(mail, email_ids)
+        
+        # Parse all emails first so sentiment can be analyzed in one batch.
+        # Headers come first: emails settled by a sender rule never need their
+        # MIME body parsed, let alone sent to an API.
+        parsed_emails = {}
+        rule_categories = {}
+        for uid, raw_email in messages.items():
             try:
-                print(f"\n📨 Processing Email {i}/{len(email_ids)}")
-                print("-" * 50)
-                
-                # Fetch email
-                result, data = mail.fetch(email_id, '(RFC822)')
-                if result != 'OK':
-                    print(f"❌ Error fetching email {email_id}")
-                    continue
-                
-                # Parse email
-                msg = email.message_from_bytes(data[0][1])
-                email_content = extract_email_content(msg)
-                
-                # Display email info
-                print(f"📋 Subject: {email_content['subject'][:100]}...")
-                print(f"👤 From: {email_content['from']}")
-                print(f"📅 Date: {email_content['date']}")
-                print(f"📝 Body Preview: {email_content['body'][:200]}...")
-                
-                # Get sentiment analysis
-                print(f"\n🧠 Analyzing sentiment...")
-                sentiment = get_sentiment_analysis(email_content['body'])
-                print(f"😊 Sentiment: {sentiment['label']} (Score: {sentiment['score']:.2f})")
-                
-                # Categorize email
-                print(f"\n🎯 Categorizing email...")
-                category = categorize_email_with_openai(email_content, sentiment)
-                print(f"📁 Category: {category}")
-                
-                print(f"\n🔍 DRY RUN: Email would be moved to folder: INBOX.{category}")
-                
-                # Add delay to avoid rate limiting
-                if i < len(email_ids):
-                    print("⏱️  Waiting 2 seconds...")
-                    time.sleep(2)
-                
+                email_content = extract_email_headers(HEADER_PARSER.parsebytes(raw_email))
+                rule_category = sender_rules.match(email_content, config)
+                if rule_category:
+                    rule_categories[uid] = rule_category
+                else:
+                    email_content['body'] = extract_email_body(MESSAGE_PARSER.parsebytes(raw_email))
+                parsed_emails[uid] = email_content
             except Exception as e:
-                print(f"❌ Error processing email {email_id}: {e}")
-                continue
+                print(f"❌ Error parsing email UID {uid}: {e}")
+        api_uids = [uid for uid in parsed_emails if uid not in rule_categories]
+        
+        # In combined mode sentiment comes back with the category, one call per email
+        combined = load_config().getboolean('OpenAI', 'combined_sentiment', fallback=False)
+        sentiments = {}
+        if not combined and api_uids:
+            print(f"🧠 Analyzing sentiment for {len(api_uids)} email(s)...")
+            sentiments = dict(zip(api_uids, get_sentiment_analysis_batch(
+                [parsed_emails[uid]['body'] for uid in api_uids]
+            )))
+        
+        # The API calls are network-bound, so categorize emails concurrently and
+        # report the results in mailbox order as they become available
+        with ThreadPoolExecutor(max_workers=CATEGORIZE_WORKERS) as executor:
+            futures = {
+                uid: executor.submit(classify_email, email_content, sentiments.get(uid),
+                                     rule_categories.get(uid), combined)
+                for uid, email_content in parsed_emails.items()
+            }
+            
+            for i, (uid, email_content) in enumerate(parsed_emails.items(), 1):
+                try:
+                    print(f"\n📨 Processing Email {i}/{len(parsed_emails)}")
+                    print("-" * 50)
+                    
+                    # Display email info
+                    print(f"📋 Subject: {email_content['subject'][:100]}...")
+                    print(f"👤 From: {email_content['from']}")
+                    print(f"📅 Date: {email_content['date']}")
+                    if email_content['body']:
+                        print(f"📝 Body Preview: {email_content['body'][:200]}...")
+                    
+                    sentiment, category, note = futures[uid].result()
+                    if note:
+                        print(note)
+                    
+                    print(f"😊 Sentiment: {sentiment['label']} (Score: {sentiment['score']:.2f})")
+                    print(f"📁 Category: {category}")
+                    
+                    print(f"\n🔍 DRY RUN: Email would be moved to folder: INBOX.{category}")
+                    
+                except Exception as e:
+                    print(f"❌ Error processing email UID {uid}: {e}")
+                    continue
         
         print("\n" + "=" * 80)
         print("✅ Dry run completed!")
         print("💡 No emails were actually moved. This was just a preview.")
         
-        mail.logout()
-        
     except Exception as e:
+        failed = True
         print(f"❌ Error: {e}")
+    finally:
+        if mail is not None:
+            if failed:
+                # The session may be broken, so never hand it back to the pool
+                _logout_quietly(mail)
+            else:
+                # Keep the session for the next run; it is logged out at exit
+                release_imap_connection(config, mail)
 
 if __name__ == "__main__":
     import sys
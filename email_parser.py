@@ -8,99 +8,205 @@ HTML content extraction, various encodings, and content sanitization.
 
 import email
 import email.header
+import functools
+import logging
 import quopri
 import base64
 import html
 import re
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from typing import Dict, List, Optional, Tuple
-import chardet
 
-class EmailContentExtractor:
-    """Advanced email content extraction with enhanced parsing capabilities."""
+# Parse errors are routine on real mailboxes; report them at DEBUG level only
+logger = logging.getLogger(__name__)
+
+# Prefer a compiled charset detector; pure-Python chardet is slow on large bodies
+try:
+    from cchardet import detect as _chardet_detect
+    UniversalDetector = None
+except ImportError:
+    try:
+        from charset_normalizer import detect as _chardet_detect
+        UniversalDetector = None
+    except ImportError:
+        from chardet import UniversalDetector
+
+# Charset sniffing looks at no more than SNIFF_LIMIT bytes, fed in SNIFF_CHUNK pieces
+SNIFF_LIMIT = 32768
+SNIFF_CHUNK = 4096
+
+# Prefer the C-backed lxml parser; fall back to the pure-Python one
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# selectolax (lexbor engine) parses and walks HTML far faster than BeautifulSoup
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# Non-content blocks dropped from the raw HTML before it is parsed
+NON_CONTENT_BLOCK_PATTERN = re.compile(
+    r'<(head|script|style|noscript)\b[^>]*>.*?</\1\s*>', re.IGNORECASE | re.DOTALL
+)
+
+# Patterns for cleaning content
+TRACKING_PATTERNS = (
+    r'<img[^>]*?src=["\']https?://[^"\']*?track[^"\']*?["\'][^>]*?>',  # Tracking pixels
+    r'<img[^>]*?width=["\']1["\'][^>]*?height=["\']1["\'][^>]*?>',     # 1x1 tracking images
+    r'https?://[^\s]*?utm_[^\s]*',                                    # UTM tracking links
+    r'https?://[^\s]*?fbclid=[^\s]*',                                 # Facebook tracking
+    r'https?://[^\s]*?gclid=[^\s]*',                                  # Google tracking
+)
+# One alternation so the tree is searched once instead of once per pattern
+TRACKING_COMBINED_PATTERN = re.compile(
+    '|'.join(f'(?:{pattern})' for pattern in TRACKING_PATTERNS), re.IGNORECASE
+)
+
+# Patterns for content cleanup
+CLEANUP_PATTERNS = (
+    r'\s+',                           # Multiple whitespace
+    r'\n\s*\n\s*\n',                 # Multiple line breaks
+    r'^\s+|\s+$',                    # Leading/trailing whitespace
+)
+STRIP_TAGS_PATTERN = re.compile(r'<[^>]+>')
+
+# URL keywords that mark tracking images and links
+IMAGE_TRACKER_PATTERN = re.compile(r'track|pixel|beacon', re.IGNORECASE)
+LINK_TRACKER_PATTERN = re.compile(r'utm_|fbclid|gclid|track', re.IGNORECASE)
+
+# HTML tags to preserve for structure
+PRESERVE_TAGS = frozenset(['p', 'div', 'br', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'ul', 'ol'])
+
+# Small HTML parts below these limits are tag-stripped instead of parsed, unless
+# they contain links, images or lists (which the parsers render specially)
+FAST_PATH_MAX_LENGTH = 4096
+FAST_PATH_MAX_TAGS = 40
+FAST_PATH_EXCLUDED_TAG_PATTERN = re.compile(r'<(?:a|img|li)\b', re.IGNORECASE)
+LINE_BREAK_TAG_PATTERN = re.compile(r'</?(?:p|div|br|h[1-6])\b[^>]*>', re.IGNORECASE)
+BREAK_TAG_PATTERN = re.compile(r'</?(?:ul|ol|table|tr|td|th|body|html)\b[^>]*>', re.IGNORECASE)
+
+# Soft cap on body text collected per message, and the assumed markup-to-text
+# ratio used to cap HTML parts before they are parsed
+MAX_TEXT_BYTES = 65536
+HTML_MARKUP_RATIO = 4
+
+# Entities that cover nearly all email text; &amp; goes last so '&amp;lt;' stays '&lt;'
+FAST_ENTITIES = (('&lt;', '<'), ('&gt;', '>'), ('&quot;', '"'), ('&#39;', "'"), ('&nbsp;', '\xa0'), ('&amp;', '&'))
+OTHER_ENTITY_PATTERN = re.compile(r'&(?!(?:amp|lt|gt|quot|#39|nbsp);)[#a-zA-Z]')
+
+# Elements rendered with a line break before and after
+BLOCK_TAGS = frozenset(['p', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+
+# String node types that count as visible text (comments, doctypes etc. are skipped)
+TEXT_NODE_TYPES = (str, NavigableString, CData)
+
+# Declared charsets whose encoded bytes can be pure ASCII without meaning ASCII text
+ASCII_INCOMPATIBLE_CHARSETS = ('utf-7', 'utf-16', 'utf-32')
+
+def _sniff(raw_bytes: bytes, limit: int = SNIFF_LIMIT) -> Dict[str, any]:
+    """Run the charset detector over at most `limit` bytes."""
+    sample = raw_bytes[:limit]
+    if UniversalDetector is None:
+        return _chardet_detect(sample)
     
-    def __init__(self):
-        # Patterns for cleaning content
-        self.tracking_patterns = [
-            r'<img[^>]*?src=["\']https?://[^"\']*?track[^"\']*?["\'][^>]*?>',  # Tracking pixels
-            r'<img[^>]*?width=["\']1["\'][^>]*?height=["\']1["\'][^>]*?>',     # 1x1 tracking images
-            r'https?://[^\s]*?utm_[^\s]*',                                    # UTM tracking links
-            r'https?://[^\s]*?fbclid=[^\s]*',                                 # Facebook tracking
-            r'https?://[^\s]*?gclid=[^\s]*',                                  # Google tracking
-        ]
-        
-        # Patterns for content cleanup
-        self.cleanup_patterns = [
-            r'\s+',                           # Multiple whitespace
-            r'\n\s*\n\s*\n',                 # Multiple line breaks
-            r'^\s+|\s+$',                    # Leading/trailing whitespace
-        ]
-        
-        # HTML tags to preserve for structure
-        self.preserve_tags = ['p', 'div', 'br', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'ul', 'ol']
+    # Feed chardet incrementally and stop as soon as it is certain
+    detector = UniversalDetector()
+    for start in range(0, len(sample), SNIFF_CHUNK):
+        detector.feed(sample[start:start + SNIFF_CHUNK])
+        if detector.done:
+            break
+    detector.close()
+    return detector.result
+
+def _detect(raw_bytes: bytes, min_confidence: float = 0.7) -> Optional[str]:
+    """Return the detected encoding (lowercased) if the detector is confident enough."""
+    detected = _sniff(raw_bytes)
+    if detected and detected.get('encoding') and (detected.get('confidence') or 0) > min_confidence:
+        return detected['encoding'].lower()
+    return None
+
+def _decode_bytes(raw_bytes: bytes, declared_encoding: str = None) -> str:
+    """Decode email bytes using the declared, detected or a fallback encoding."""
+    if not raw_bytes:
+        return ""
     
-    def _detect_encoding(self, raw_bytes: bytes, declared_encoding: str = None) -> str:
-        """Detect the actual encoding of email content."""
-        # Try declared encoding first
-        if declared_encoding:
-            try:
-                raw_bytes.decode(declared_encoding)
-                return declared_encoding.lower()
-            except (UnicodeDecodeError, LookupError):
-                pass
-        
-        # Use chardet for detection
+    # Pure ASCII decodes the same under every ASCII-compatible charset
+    if raw_bytes.isascii() and not (declared_encoding and declared_encoding.lower().startswith(ASCII_INCOMPATIBLE_CHARSETS)):
+        return raw_bytes.decode('ascii')
+    
+    # Try declared encoding first
+    if declared_encoding:
         try:
-            detected = chardet.detect(raw_bytes)
-            if detected and detected['confidence'] > 0.7:
-                return detected['encoding'].lower()
-        except Exception:
+            return raw_bytes.decode(declared_encoding)
+        except (UnicodeDecodeError, LookupError):
             pass
+    
+    # Use the charset detector
+    try:
+        detected = _detect(raw_bytes)
+        if detected:
+            return raw_bytes.decode(detected, errors='replace')
+    except Exception:
+        pass
+    
+    # Fallback encodings in order of preference
+    fallback_encodings = ['utf-8', 'iso-8859-1', 'windows-1252', 'ascii']
+    
+    for encoding in fallback_encodings:
+        try:
+            return raw_bytes.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    
+    # Last resort - decode with errors='replace'
+    return raw_bytes.decode('utf-8', errors='replace')
+
+@functools.lru_cache(maxsize=8192)
+def _decode_header_cached(header_value: str) -> str:
+    """Decode email header with proper encoding handling (cached by raw value)."""
+    if not header_value:
+        return ""
+    
+    try:
+        decoded_parts = email.header.decode_header(header_value)
+        decoded_string = ""
         
-        # Fallback encodings in order of preference
-        fallback_encodings = ['utf-8', 'iso-8859-1', 'windows-1252', 'ascii']
-        
-        for encoding in fallback_encodings:
-            try:
-                raw_bytes.decode(encoding)
-                return encoding
-            except UnicodeDecodeError:
-                continue
+        for part, encoding in decoded_parts:
+            if isinstance(part, bytes):
+                decoded_string += _decode_bytes(part, encoding)
+            else:
+                decoded_string += str(part)
         
-        # Last resort - decode with errors='replace'
-        return 'utf-8'
+        return decoded_string.strip()
+    except Exception as e:
+        logger.debug("Error decoding header: %s", e)
+        return str(header_value)
+
+class EmailContentExtractor:
+    """Advanced email content extraction with enhanced parsing capabilities."""
+    
+    def __init__(self):
+        # Shared, immutable module-level patterns: creating an extractor compiles nothing
+        self.tracking_patterns = TRACKING_PATTERNS
+        self.cleanup_patterns = CLEANUP_PATTERNS
+        self.preserve_tags = PRESERVE_TAGS
+    
+    def _decode_bytes(self, raw_bytes: bytes, declared_encoding: str = None) -> str:
+        """Decode email bytes using the declared, detected or a fallback encoding."""
+        return _decode_bytes(raw_bytes, declared_encoding)
     
     def _decode_header(self, header_value: str) -> str:
         """Decode email header with proper encoding handling."""
-        if not header_value:
-            return ""
-        
-        try:
-            decoded_parts = email.header.decode_header(header_value)
-            decoded_string = ""
-            
-            for part, encoding in decoded_parts:
-                if isinstance(part, bytes):
-                    if encoding:
-                        try:
-                            decoded_string += part.decode(encoding)
-                        except (UnicodeDecodeError, LookupError):
-                            # Try to detect encoding
-                            detected_encoding = self._detect_encoding(part, encoding)
-                            decoded_string += part.decode(detected_encoding, errors='replace')
-                    else:
-                        # Try to detect encoding
-                        detected_encoding = self._detect_encoding(part)
-                        decoded_string += part.decode(detected_encoding, errors='replace')
-                else:
-                    decoded_string += str(part)
-            
-            return decoded_string.strip()
-        except Exception as e:
-            print(f"Error decoding header: {e}")
-            return str(header_value)
+        if isinstance(header_value, str):
+            return _decode_header_cached(header_value)
+        # Header objects are not hashable, decode them uncached
+        return _decode_header_cached.__wrapped__(header_value)
     
     def _decode_content(self, part) -> str:
         """Decode email part content with proper encoding and transfer encoding handling."""
@@ -122,7 +228,7 @@ class EmailContentExtractor:
                 try:
                     payload = base64.b64decode(payload)
                 except Exception as e:
-                    print(f"Error decoding base64: {e}")
+                    logger.debug("Error decoding base64: %s", e)
                     return ""
             elif transfer_encoding == 'quoted-printable':
                 try:
@@ -130,54 +236,131 @@ class EmailContentExtractor:
                         payload = payload.encode('ascii')
                     payload = quopri.decodestring(payload)
                 except Exception as e:
-                    print(f"Error decoding quoted-printable: {e}")
+                    logger.debug("Error decoding quoted-printable: %s", e)
                     return ""
             elif isinstance(payload, str):
                 payload = payload.encode('utf-8')
             
             # Handle character encoding
             charset = part.get_content_charset()
-            if not charset:
-                charset = part.get_charset()
+            if not charset and part.get_charset():
+                charset = str(part.get_charset())
             
             if isinstance(payload, bytes):
-                detected_encoding = self._detect_encoding(payload, charset)
-                try:
-                    return payload.decode(detected_encoding, errors='replace')
-                except Exception as e:
-                    print(f"Error decoding content: {e}")
-                    return payload.decode('utf-8', errors='replace')
+                return self._decode_bytes(payload, charset)
             else:
                 return str(payload)
                 
         except Exception as e:
-            print(f"Error in _decode_content: {e}")
+            logger.debug("Error in _decode_content: %s", e)
             return ""
     
+    def _is_tracking_image(self, src: str, width: str, height: str) -> bool:
+        """Check for tracking pixels (1x1 images or tracking URLs)."""
+        return (width == '1' and height == '1') or IMAGE_TRACKER_PATTERN.search(src) is not None
+    
+    def _link_replacement(self, href: str, text: str) -> str:
+        """Text that replaces a link: its text plus the URL, unless it is a tracking link."""
+        if LINK_TRACKER_PATTERN.search(href):
+            return text if text else '[Link]'
+        if href and text and href != text:
+            return f"{text} ({href})"
+        return text if text else '[Link]'
+    
+    def _is_simple_html(self, html_content: str) -> bool:
+        """Check whether an HTML part is small and plain enough to skip the parser."""
+        return (len(html_content) < FAST_PATH_MAX_LENGTH
+                and html_content.count('<') < FAST_PATH_MAX_TAGS
+                and not FAST_PATH_EXCLUDED_TAG_PATTERN.search(html_content))
+    
+    def _extract_simple_html_content(self, html_content: str) -> str:
+        """Extract text from simple HTML by stripping tags with regexes."""
+        text = NON_CONTENT_BLOCK_PATTERN.sub(' ', html_content)
+        text = LINE_BREAK_TAG_PATTERN.sub('\n', text)
+        text = BREAK_TAG_PATTERN.sub(' ', text)
+        text = STRIP_TAGS_PATTERN.sub('', text)
+        return self._clean_text_content(text)
+    
+    def _extract_html_content_lexbor(self, html_content: str) -> str:
+        """Extract text content from HTML using selectolax's lexbor parser."""
+        tree = LexborHTMLParser(html_content)
+        
+        # Remove non-content elements
+        for node in tree.css('head, script, style, noscript, meta, link'):
+            node.decompose()
+        
+        root = tree.body or tree.root
+        if root is None:
+            return ""
+        
+        # Remove elements whose text is a tracking URL
+        tracking_parents = {}
+        for node in root.traverse(include_text=True):
+            if node.tag == '-text' and node.parent is not None and TRACKING_COMBINED_PATTERN.search(node.text_content or ''):
+                tracking_parents[node.parent.mem_id] = node.parent
+        for parent in tracking_parents.values():
+            # Skip nodes already removed along with a tracking ancestor
+            ancestor = parent.parent
+            while ancestor is not None and ancestor.mem_id not in tracking_parents:
+                ancestor = ancestor.parent
+            if ancestor is None:
+                parent.decompose()
+        
+        root = tree.body or tree.root
+        if root is None:
+            return ""
+        
+        # Drop tracking images, replace the rest with alt text or placeholder
+        for img in root.css('img'):
+            attrs = img.attributes
+            if self._is_tracking_image(attrs.get('src') or '', attrs.get('width') or '', attrs.get('height') or ''):
+                img.decompose()
+            else:
+                img.replace_with(f"[{attrs.get('alt', '[Image]') or ''}]")
+        
+        # Convert links to text with URL
+        for link in root.css('a'):
+            link.replace_with(self._link_replacement(link.attributes.get('href') or '', link.text(strip=True)))
+        
+        # Line breaks for block elements and list items
+        for br in root.css('br'):
+            br.replace_with('\n')
+        for node in root.css(', '.join(sorted(BLOCK_TAGS))):
+            node.insert_before('\n')
+            node.insert_after('\n')
+        for li in root.css('li'):
+            li.insert_before('\n• ')
+            li.insert_after('\n')
+        
+        return self._clean_text_content(root.text())
+    
     def _extract_html_content(self, html_content: str) -> str:
         """Extract text content from HTML with structure preservation."""
         try:
-            # Parse HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
+            if self._is_simple_html(html_content):
+                return self._extract_simple_html_content(html_content)
             
-            # Remove script and style elements
+            if LexborHTMLParser is not None:
+                return self._extract_html_content_lexbor(html_content)
+            
+            # Parse HTML, skipping <head>, scripts and styles so they are never
+            # built into the tree (a SoupStrainer cannot do this: it only filters
+            # top-level tags, and everything nested inside <html> would still match)
+            soup = BeautifulSoup(NON_CONTENT_BLOCK_PATTERN.sub(' ', html_content), HTML_PARSER)
+            
+            # Remove any remaining script and style elements
             for script in soup(["script", "style", "meta", "link"]):
                 script.decompose()
             
             # Remove tracking pixels and images
-            for pattern in self.tracking_patterns:
-                for match in soup.find_all(string=re.compile(pattern, re.IGNORECASE)):
-                    if match.parent:
-                        match.parent.decompose()
+            for match in soup.find_all(string=TRACKING_COMBINED_PATTERN):
+                if match.parent:
+                    match.parent.decompose()
             
             # Remove tracking images
             for img in soup.find_all('img'):
-                src = img.get('src', '')
-                width = img.get('width', '')
-                height = img.get('height', '')
-                
                 # Remove tracking pixels (1x1 images or tracking URLs)
-                if (width == '1' and height == '1') or any(track in src.lower() for track in ['track', 'pixel', 'beacon']):
+                if self._is_tracking_image(img.get('src', ''), img.get('width', ''), img.get('height', '')):
                     img.decompose()
                     continue
                 
@@ -190,32 +373,10 @@ class EmailContentExtractor:
                 href = link.get('href', '')
                 text = link.get_text(strip=True)
                 
-                # Skip tracking links
-                if any(track in href.lower() for track in ['utm_', 'fbclid', 'gclid', 'track']):
-                    link.replace_with(text if text else '[Link]')
-                elif href and text and href != text:
-                    link.replace_with(f"{text} ({href})")
-                elif text:
-                    link.replace_with(text)
-                else:
-                    link.replace_with('[Link]')
-            
-            # Add line breaks for block elements
-            for tag in soup.find_all(['p', 'div', 'br', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-                if tag.name == 'br':
-                    tag.replace_with('\n')
-                else:
-                    # Add newlines around block elements
-                    tag.insert_before('\n')
-                    tag.insert_after('\n')
-            
-            # Add line breaks for list items
-            for li in soup.find_all('li'):
-                li.insert_before('\n• ')
-                li.insert_after('\n')
+                link.replace_with(self._link_replacement(href, text))
             
-            # Get text content
-            text = soup.get_text()
+            # Get text content with line breaks for block elements and list items
+            text = self._render_text(soup)
             
             # Clean up the text
             text = self._clean_text_content(text)
@@ -223,62 +384,91 @@ class EmailContentExtractor:
             return text
             
         except Exception as e:
-            print(f"Error extracting HTML content: {e}")
+            logger.debug("Error extracting HTML content: %s", e)
             # Fallback - strip all HTML tags
-            return re.sub(r'<[^>]+>', ' ', html_content)
+            return STRIP_TAGS_PATTERN.sub(' ', html_content)
+    
+    def _render_text(self, root) -> str:
+        """Render a parsed tree to text in one pass without mutating it."""
+        out = []
+        stack = [root]
+        
+        while stack:
+            node = stack.pop()
+            
+            if isinstance(node, Tag):
+                if node.name == 'br':
+                    out.append('\n')
+                    continue
+                if node.name == 'li':
+                    out.append('\n• ')
+                    stack.append('\n')
+                elif node.name in BLOCK_TAGS:
+                    out.append('\n')
+                    stack.append('\n')
+                # Children are pushed in reverse so they pop in document order
+                stack.extend(reversed(node.contents))
+            elif type(node) in TEXT_NODE_TYPES:
+                out.append(node)
+        
+        return ''.join(out)
     
     def _clean_text_content(self, text: str) -> str:
         """Clean and normalize text content."""
         if not text:
             return ""
         
-        # Unescape HTML entities
-        text = html.unescape(text)
-        
-        # Apply cleanup patterns
-        # Multiple whitespace -> single space
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Multiple line breaks -> double line break
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-        
-        # Clean up bullet points
-        text = re.sub(r'\n\s*•\s*\n', '\n• ', text)
+        # Unescape HTML entities, using plain replacements when only the common ones occur
+        if '&' in text:
+            if OTHER_ENTITY_PATTERN.search(text):
+                text = html.unescape(text)
+            else:
+                for entity, char in FAST_ENTITIES:
+                    text = text.replace(entity, char)
         
-        # Remove leading/trailing whitespace
-        text = text.strip()
+        # Collapse whitespace within each line and drop empty lines, so the line
+        # breaks rendered for blocks, <br> and list items survive; str.split()
+        # uses the same whitespace definition as \s
+        lines = (' '.join(line.split()) for line in text.splitlines())
+        return '\n'.join(line for line in lines if line)
+    
+    def _attachment_info(self, part) -> Dict[str, str]:
+        """Describe an attachment part."""
+        filename = part.get_filename()
+        if filename:
+            filename = self._decode_header(filename)
+        else:
+            filename = "unnamed_attachment"
         
-        return text
+        return {
+            'filename': filename,
+            'content_type': part.get_content_type(),
+            'size': self._estimate_payload_size(part)
+        }
     
-    def _extract_attachments_info(self, msg) -> List[Dict[str, str]]:
-        """Extract information about email attachments."""
-        attachments = []
+    def _estimate_payload_size(self, part) -> int:
+        """Estimate the decoded size of a part from its encoded payload, without decoding it."""
+        raw = part.get_payload(decode=False)
+        if not isinstance(raw, str):
+            return 0
         
-        for part in msg.walk():
-            content_disposition = part.get("Content-Disposition", "")
-            
-            if "attachment" in content_disposition:
-                filename = part.get_filename()
-                if filename:
-                    filename = self._decode_header(filename)
-                else:
-                    filename = "unnamed_attachment"
-                
-                content_type = part.get_content_type()
-                content_size = len(part.get_payload(decode=True) or b"")
-                
-                attachments.append({
-                    'filename': filename,
-                    'content_type': content_type,
-                    'size': content_size
-                })
+        transfer_encoding = part.get('Content-Transfer-Encoding', '').lower()
+        
+        if transfer_encoding == 'base64':
+            encoded_length = len(raw) - raw.count('\n') - raw.count('\r') - raw.count('=')
+            return max(encoded_length * 3 // 4, 0)
+        elif transfer_encoding == 'quoted-printable':
+            return int(len(raw) * 0.9)
         
-        return attachments
+        return len(raw.encode('utf-8', errors='surrogateescape'))
     
-    def extract_email_content(self, msg) -> Dict[str, any]:
+    def extract_email_content(self, msg, max_text_bytes: int = MAX_TEXT_BYTES) -> Dict[str, any]:
         """
         Extract comprehensive email content from email message.
         
+        Body parts stop being decoded once about max_text_bytes of text has been
+        collected; classification only needs the start of the message.
+        
         Returns:
             Dict containing subject, from, to, content, html_content, attachments, etc.
         """
@@ -304,21 +494,24 @@ class EmailContentExtractor:
             result['cc'] = self._decode_header(msg.get('Cc', ''))
             result['date'] = self._decode_header(msg.get('Date', ''))
             
-            # Extract attachments info
-            result['attachments'] = self._extract_attachments_info(msg)
-            
             # Extract content
             text_parts = []
             html_parts = []
+            collected = 0
+            max_html_length = max_text_bytes * HTML_MARKUP_RATIO
             
             if msg.is_multipart():
-                # Handle multipart messages
+                # Handle multipart messages, collecting attachments in the same walk
                 for part in msg.walk():
                     content_type = part.get_content_type()
                     content_disposition = part.get("Content-Disposition", "")
                     
-                    # Skip attachments
                     if "attachment" in content_disposition:
+                        result['attachments'].append(self._attachment_info(part))
+                        continue
+                    
+                    # Enough text collected; keep walking only to list attachments
+                    if collected >= max_text_bytes:
                         continue
                     
                     try:
@@ -326,21 +519,26 @@ class EmailContentExtractor:
                             content = self._decode_content(part)
                             if content.strip():
                                 text_parts.append(content)
+                                collected += len(content)
                         
                         elif content_type == "text/html":
-                            html_content = self._decode_content(part)
+                            html_content = self._decode_content(part)[:max_html_length]
                             if html_content.strip():
                                 html_parts.append(html_content)
                                 result['has_html'] = True
+                                collected += len(html_content) // HTML_MARKUP_RATIO
                         
                     except Exception as e:
-                        print(f"Error processing part {content_type}: {e}")
+                        logger.debug("Error processing part %s: %s", content_type, e)
                         result['encoding_issues'] = True
             
             else:
                 # Handle non-multipart messages
                 content_type = msg.get_content_type()
                 
+                if "attachment" in msg.get("Content-Disposition", ""):
+                    result['attachments'].append(self._attachment_info(msg))
+                
                 try:
                     if content_type == "text/plain":
                         content = self._decode_content(msg)
@@ -348,23 +546,24 @@ class EmailContentExtractor:
                             text_parts.append(content)
                     
                     elif content_type == "text/html":
-                        html_content = self._decode_content(msg)
+                        html_content = self._decode_content(msg)[:max_html_length]
                         if html_content.strip():
                             html_parts.append(html_content)
                             result['has_html'] = True
                     
                 except Exception as e:
-                    print(f"Error processing message content: {e}")
+                    logger.debug("Error processing message content: %s", e)
                     result['encoding_issues'] = True
             
             # Combine and clean content
             if html_parts:
-                # Extract text from HTML
-                combined_html = '\n\n'.join(html_parts)
-                result['html_content'] = combined_html
+                # Alternatives carry the same content; only the last (preferred) one is needed
+                if msg.get_content_subtype() == 'alternative':
+                    html_parts = html_parts[-1:]
+                result['html_content'] = '\n\n'.join(html_parts)
                 
-                # Extract clean text from HTML
-                extracted_text = self._extract_html_content(combined_html)
+                # Extract clean text from each HTML part separately
+                extracted_text = '\n\n'.join(filter(None, (self._extract_html_content(part) for part in html_parts)))
                 
                 # Combine with plain text parts
                 all_text = text_parts + [extracted_text] if extracted_text else text_parts
@@ -389,7 +588,7 @@ class EmailContentExtractor:
                     result['content'] = "[No content available]"
             
         except Exception as e:
-            print(f"Error in extract_email_content: {e}")
+            logger.debug("Error in extract_email_content: %s", e)
             result['encoding_issues'] = True
             
             # Fallback extraction
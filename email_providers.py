@@ -6,13 +6,41 @@ Handles provider-specific configurations, authentication methods,
 and IMAP quirks for various email services.
 """
 
+import functools
 import imaplib
 import re
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from urllib.parse import urlparse
 
-@dataclass
+# Characters that UTF-7 leaves unchanged; names made only of these need no encoding
+UTF7_DIRECT_CHARS = frozenset(chr(code) for code in range(128) if chr(code).encode('utf-7') == chr(code).encode('ascii'))
+
+# Email domains of the known providers, mapped to provider IDs
+PROVIDER_DOMAINS = {
+    'gmail.com': 'gmail', 'googlemail.com': 'gmail',
+    'outlook.com': 'outlook', 'hotmail.com': 'outlook', 'live.com': 'outlook', 'msn.com': 'outlook',
+    'yahoo.com': 'yahoo', 'yahoo.co.uk': 'yahoo', 'yahoo.ca': 'yahoo', 'ymail.com': 'yahoo',
+    'icloud.com': 'icloud', 'me.com': 'icloud', 'mac.com': 'icloud',
+    'protonmail.com': 'protonmail', 'protonmail.ch': 'protonmail', 'pm.me': 'protonmail',
+}
+
+@dataclass(frozen=True, slots=True)
+class ProviderQuirks:
+    """Provider-specific IMAP behaviour; defaults describe a plain IMAP server."""
+    all_mail_folder: str = ""
+    supports_labels: bool = False
+    supports_idle: bool = False
+    case_sensitive_folders: bool = True
+    auto_expunge: bool = True
+    folder_encoding: str = ""
+    requires_auth_plain: bool = False
+    app_password_required: bool = False
+    local_bridge_required: bool = False
+    bridge_auth: bool = False
+    max_connections: int = 0
+
+@dataclass(slots=True)
 class ProviderConfig:
     """Configuration for an email provider."""
     name: str
@@ -24,17 +52,31 @@ class ProviderConfig:
     use_starttls: bool = False
     folder_prefix: str = ""
     folder_separator: str = "/"
-    auth_methods: List[str] = None
+    auth_methods: List[str] = field(default_factory=list)
     oauth2_enabled: bool = False
     oauth2_scope: str = ""
-    special_folders: Dict[str, str] = None
-    quirks: Dict[str, any] = None
+    special_folders: Dict[str, str] = field(default_factory=dict)
+    quirks: ProviderQuirks = field(default_factory=ProviderQuirks)
 
 class EmailProviderManager:
     """Manages email provider configurations and compatibility."""
     
     def __init__(self):
         self.providers = self._initialize_providers()
+        
+        # Lowercased IMAP servers for server-based detection: exact hostnames first,
+        # then substring matches with the longest (most specific) server names first
+        self._server_to_provider = {config.imap_server.lower(): provider_id
+                                    for provider_id, config in self.providers.items() if config.imap_server}
+        self._server_suffixes = sorted(self._server_to_provider.items(), key=lambda item: len(item[0]), reverse=True)
+        
+        # Detection is pure over (domain, server); most batches repeat a handful of domains
+        self._detect_cached = functools.lru_cache(maxsize=4096)(self._detect)
+        
+        # Provider configurations never change after init, so render their descriptions once
+        self._setup_cache = {provider_id: self._build_setup_instructions(config)
+                             for provider_id, config in self.providers.items()}
+        self._listing_cache = self._build_provider_listing()
     
     def _initialize_providers(self) -> Dict[str, ProviderConfig]:
         """Initialize configurations for major email providers."""
@@ -61,12 +103,12 @@ class EmailProviderManager:
                 "spam": "[Gmail]/Spam",
                 "important": "[Gmail]/Important"
             },
-            quirks={
-                "all_mail_folder": "[Gmail]/All Mail",
-                "supports_labels": True,
-                "case_sensitive_folders": False,
-                "auto_expunge": False
-            }
+            quirks=ProviderQuirks(
+                all_mail_folder="[Gmail]/All Mail",
+                supports_labels=True,
+                case_sensitive_folders=False,
+                auto_expunge=False
+            )
         )
         
         # Outlook.com / Hotmail
@@ -89,12 +131,12 @@ class EmailProviderManager:
                 "trash": "Deleted Items",
                 "junk": "Junk Email"
             },
-            quirks={
-                "folder_encoding": "utf-7",
-                "supports_idle": True,
-                "case_sensitive_folders": False,
-                "requires_auth_plain": True
-            }
+            quirks=ProviderQuirks(
+                folder_encoding="utf-7",
+                supports_idle=True,
+                case_sensitive_folders=False,
+                requires_auth_plain=True
+            )
         )
         
         # Yahoo Mail
@@ -116,12 +158,12 @@ class EmailProviderManager:
                 "trash": "Trash",
                 "spam": "Bulk Mail"
             },
-            quirks={
-                "app_password_required": True,
-                "supports_idle": False,
-                "case_sensitive_folders": True,
-                "max_connections": 1
-            }
+            quirks=ProviderQuirks(
+                app_password_required=True,
+                supports_idle=False,
+                case_sensitive_folders=True,
+                max_connections=1
+            )
         )
         
         # Apple iCloud
@@ -143,12 +185,12 @@ class EmailProviderManager:
                 "trash": "Deleted Messages",
                 "junk": "Junk"
             },
-            quirks={
-                "app_password_required": True,
-                "supports_idle": True,
-                "case_sensitive_folders": False,
-                "folder_encoding": "utf-7"
-            }
+            quirks=ProviderQuirks(
+                app_password_required=True,
+                supports_idle=True,
+                case_sensitive_folders=False,
+                folder_encoding="utf-7"
+            )
         )
         
         # ProtonMail Bridge
@@ -171,12 +213,12 @@ class EmailProviderManager:
                 "trash": "Trash",
                 "spam": "Spam"
             },
-            quirks={
-                "local_bridge_required": True,
-                "supports_idle": False,
-                "case_sensitive_folders": False,
-                "bridge_auth": True
-            }
+            quirks=ProviderQuirks(
+                local_bridge_required=True,
+                supports_idle=False,
+                case_sensitive_folders=False,
+                bridge_auth=True
+            )
         )
         
         # Generic IMAP (fallback)
@@ -197,38 +239,39 @@ class EmailProviderManager:
                 "drafts": "Drafts",
                 "trash": "Trash"
             },
-            quirks={}
+            quirks=ProviderQuirks()
         )
         
+        # Lowercase special folder keys once so lookups need no normalization
+        for config in providers.values():
+            config.special_folders = {key.lower(): value for key, value in config.special_folders.items()}
+        
         return providers
     
     def detect_provider(self, email_address: str, imap_server: str = None) -> str:
         """Detect email provider from email address or server."""
         email_address = email_address.lower()
         
-        # Extract domain from email
-        if '@' in email_address:
-            domain = email_address.split('@')[1]
-        else:
-            domain = email_address
+        # Extract domain from email (the whole value when there is no '@')
+        domain = email_address.rpartition('@')[2]
         
+        return self._detect_cached(domain, imap_server)
+    
+    def _detect(self, domain: str, imap_server: Optional[str]) -> str:
+        """Detect the provider for a lowercased domain and optional IMAP server."""
         # Domain-based detection
-        if domain in ['gmail.com', 'googlemail.com']:
-            return 'gmail'
-        elif domain in ['outlook.com', 'hotmail.com', 'live.com', 'msn.com']:
-            return 'outlook'
-        elif domain in ['yahoo.com', 'yahoo.co.uk', 'yahoo.ca', 'ymail.com']:
-            return 'yahoo'
-        elif domain in ['icloud.com', 'me.com', 'mac.com']:
-            return 'icloud'
-        elif domain in ['protonmail.com', 'protonmail.ch', 'pm.me']:
-            return 'protonmail'
+        provider_id = PROVIDER_DOMAINS.get(domain)
+        if provider_id:
+            return provider_id
         
         # Server-based detection (if provided)
         if imap_server:
             imap_server = imap_server.lower()
-            for provider_id, config in self.providers.items():
-                if config.imap_server.lower() in imap_server:
+            provider_id = self._server_to_provider.get(imap_server)
+            if provider_id:
+                return provider_id
+            for server, provider_id in self._server_suffixes:
+                if server in imap_server:
                     return provider_id
         
         return 'generic'
@@ -242,8 +285,9 @@ class EmailProviderManager:
         config = self.get_provider_config(provider_id)
         
         # Check special folders first
-        if folder_name.lower() in config.special_folders:
-            return config.special_folders[folder_name.lower()]
+        special_folder = config.special_folders.get(folder_name.lower())
+        if special_folder:
+            return special_folder
         
         # Apply folder prefix if needed
         if config.folder_prefix:
@@ -256,15 +300,14 @@ class EmailProviderManager:
         config = self.get_provider_config(provider_id)
         
         # Handle case sensitivity
-        if not config.quirks.get('case_sensitive_folders', True):
+        if not config.quirks.case_sensitive_folders:
             folder_name = folder_name.lower()
         
-        # Handle folder encoding
-        if config.quirks.get('folder_encoding') == 'utf-7':
+        # Handle folder encoding (plain ASCII names are already valid UTF-7)
+        if config.quirks.folder_encoding == 'utf-7' and not UTF7_DIRECT_CHARS.issuperset(folder_name):
             try:
-                # Convert to UTF-7 if needed
                 folder_name = folder_name.encode('utf-7').decode('ascii')
-            except:
+            except UnicodeError:
                 pass
         
         return folder_name
@@ -289,7 +332,7 @@ class EmailProviderManager:
                     mail.starttls()
             
             # Apply provider-specific connection settings
-            if config.quirks.get('requires_auth_plain'):
+            if config.quirks.requires_auth_plain:
                 # Some providers require AUTH=PLAIN
                 pass  # This would be handled in authentication
             
@@ -307,9 +350,10 @@ class EmailProviderManager:
             # Test login
             mail.login(username, password)
             
-            # Test basic operations
-            mail.select('INBOX')
-            result, data = mail.search(None, 'ALL')
+            # Test basic operations (SELECT already reports the message count)
+            status, count = mail.select('INBOX', readonly=True)
+            if status != 'OK':
+                raise imaplib.IMAP4.error(f"Could not select INBOX: {count[0]!r}")
             
             mail.logout()
             
@@ -320,8 +364,15 @@ class EmailProviderManager:
     
     def get_setup_instructions(self, provider_id: str) -> Dict[str, str]:
         """Get setup instructions for a provider."""
-        config = self.get_provider_config(provider_id)
-        
+        cached = self._setup_cache.get(provider_id, self._setup_cache['generic'])
+        return dict(cached, notes=list(cached['notes']))
+    
+    def list_supported_providers(self) -> List[Dict[str, str]]:
+        """List all supported email providers."""
+        return [dict(provider) for provider in self._listing_cache]
+    
+    def _build_setup_instructions(self, config: ProviderConfig) -> Dict[str, str]:
+        """Render setup instructions for a provider configuration."""
         instructions = {
             'provider': config.name,
             'imap_server': config.imap_server,
@@ -335,24 +386,24 @@ class EmailProviderManager:
         # Add provider-specific notes
         notes = []
         
-        if config.quirks.get('app_password_required'):
+        if config.quirks.app_password_required:
             notes.append("App-specific password required (not your regular password)")
         
-        if config.quirks.get('local_bridge_required'):
+        if config.quirks.local_bridge_required:
             notes.append("Local bridge application must be running")
         
         if config.oauth2_enabled:
             notes.append("OAuth2 authentication supported for enhanced security")
         
-        if config.quirks.get('max_connections'):
-            notes.append(f"Maximum {config.quirks['max_connections']} concurrent connection(s)")
+        if config.quirks.max_connections:
+            notes.append(f"Maximum {config.quirks.max_connections} concurrent connection(s)")
         
         instructions['notes'] = notes
         
         return instructions
     
-    def list_supported_providers(self) -> List[Dict[str, str]]:
-        """List all supported email providers."""
+    def _build_provider_listing(self) -> List[Dict[str, str]]:
+        """Render the list of supported providers."""
         providers_list = []
         
         for provider_id, config in self.providers.items():
@@ -364,7 +415,7 @@ class EmailProviderManager:
                 'name': config.name,
                 'server': config.imap_server,
                 'oauth2_supported': config.oauth2_enabled,
-                'app_password_required': config.quirks.get('app_password_required', False)
+                'app_password_required': config.quirks.app_password_required
             })
         
         return providers_list
@@ -5,62 +5,180 @@ Processing Database
 SQLite-backed storage for processed email records and aggregation utilities.
 """
 
+import atexit
 import os
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
 
 DATA_DIR = os.path.join(os.getcwd(), 'data')
 DB_PATH = os.path.join(DATA_DIR, 'processing.db')
 
+# One connection per thread, reused across calls; the schema is created once per process
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+# Single-record inserts are buffered and written in one transaction once
+# FLUSH_THRESHOLD rows are pending; a timer writes smaller batches at most
+# FLUSH_INTERVAL seconds after their first row, even if nothing else arrives
+FLUSH_THRESHOLD = 100
+FLUSH_INTERVAL = 5.0
+_pending: List[tuple] = []
+_flush_lock = threading.Lock()
+_flush_timer: threading.Timer | None = None
+
+# Category name -> categories.id, filled as names are first seen
+_category_ids: Dict[str, int] = {}
+
+EPOCH = datetime(1970, 1, 1)
+
+INSERT_SQL = """
+    INSERT INTO processed_emails (
+        timestamp_us, subject, sender, category_id, confidence, sentiment, processing_time,
+        content_length, api_cost_openai, api_cost_huggingface
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Timestamps are stored as integer microseconds since the Unix epoch (UTC)
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS processed_emails (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp_us INTEGER NOT NULL,
+        subject TEXT,
+        sender TEXT,
+        category_id INTEGER REFERENCES categories(id),
+        confidence REAL,
+        sentiment TEXT,
+        processing_time REAL,
+        content_length INTEGER,
+        api_cost_openai REAL,
+        api_cost_huggingface REAL,
+        day TEXT GENERATED ALWAYS AS (date(timestamp_us / 1000000, 'unixepoch')) VIRTUAL
+    )
+"""
+
+# Converts the legacy ISO 8601 text timestamps ('YYYY-MM-DDTHH:MM:SS[.ffffff]')
+LEGACY_TIMESTAMP_US_SQL = (
+    "CAST(strftime('%s', l.timestamp) AS INTEGER) * 1000000 + CAST(substr(l.timestamp, 21, 6) AS INTEGER)"
+)
+
 
 def _ensure_db():
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            _create_schema()
+            _schema_ready = True
+
+
+def _create_schema():
     os.makedirs(DATA_DIR, exist_ok=True)
     with sqlite3.connect(DB_PATH) as conn:
+        # Category names are stored once and referenced by integer id
         conn.execute(
             """
-            CREATE TABLE IF NOT EXISTS processed_emails (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                subject TEXT,
-                sender TEXT,
-                category TEXT,
-                confidence REAL,
-                sentiment TEXT,
-                processing_time REAL,
-                content_length INTEGER,
-                api_cost_openai REAL,
-                api_cost_huggingface REAL
+            CREATE TABLE IF NOT EXISTS categories (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
             )
             """
         )
+        conn.execute(CREATE_TABLE_SQL)
+
+        # Rebuild databases that still use text timestamps (requires SQLite 3.31+)
+        columns = {row[1] for row in conn.execute('PRAGMA table_xinfo(processed_emails)')}
+        if 'timestamp' in columns:
+            _migrate_legacy_table(conn, columns)
+
         conn.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_processed_emails_timestamp
-            ON processed_emails(timestamp)
+            CREATE INDEX IF NOT EXISTS idx_processed_emails_timestamp_us
+            ON processed_emails(timestamp_us)
             """
         )
         conn.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_processed_emails_category
-            ON processed_emails(category)
+            CREATE INDEX IF NOT EXISTS idx_processed_emails_category_id
+            ON processed_emails(category_id)
+            """
+        )
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_processed_emails_day_category_id
+            ON processed_emails(day, category_id)
             """
         )
         conn.commit()
 
 
+def _migrate_legacy_table(conn, columns) -> None:
+    """Copy rows from the text-timestamp layout (with category names or ids) into the current one."""
+    # One transaction, so an interrupted migration leaves the old table untouched
+    conn.execute('BEGIN')
+    conn.execute('ALTER TABLE processed_emails RENAME TO processed_emails_legacy')
+    conn.execute(CREATE_TABLE_SQL)
+
+    if 'category' in columns:
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO categories (name)
+            SELECT DISTINCT category FROM processed_emails_legacy WHERE category IS NOT NULL
+            """
+        )
+        category_sql = '(SELECT id FROM categories WHERE name = l.category)'
+    else:
+        category_sql = 'l.category_id'
+
+    conn.execute(
+        f"""
+        INSERT INTO processed_emails (
+            id, timestamp_us, subject, sender, category_id, confidence, sentiment, processing_time,
+            content_length, api_cost_openai, api_cost_huggingface
+        )
+        SELECT l.id, {LEGACY_TIMESTAMP_US_SQL}, l.subject, l.sender, {category_sql}, l.confidence,
+               l.sentiment, l.processing_time, l.content_length, l.api_cost_openai, l.api_cost_huggingface
+        FROM processed_emails_legacy l
+        """
+    )
+    conn.execute('DROP TABLE processed_emails_legacy')
+
+
 @contextmanager
 def _get_conn():
-    _ensure_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        _ensure_db()
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        _local.conn = conn
+    yield conn
+
+
+@contextmanager
+def _read_snapshot(conn):
+    """Run several reads inside one transaction so they share a snapshot and lock."""
+    conn.execute('BEGIN')
     try:
-        yield conn
+        yield
     finally:
-        conn.close()
+        conn.execute('COMMIT')
 
 
-def record_processed_email(
+def _iso_timestamp(timestamp_us: int) -> str:
+    """Render stored epoch microseconds as an ISO 8601 UTC string."""
+    return (EPOCH + timedelta(microseconds=timestamp_us)).isoformat(timespec='microseconds')
+
+
+def _build_record(
     subject: str,
     sender: str,
     category: str,
@@ -69,43 +187,105 @@ def record_processed_email(
     processing_time: float = None,
     content_length: int = None,
     api_costs: Dict[str, float] | None = None,
-) -> None:
-    """Insert a processed email record."""
-    ts = datetime.utcnow().isoformat()
+) -> tuple:
+    ts = time.time_ns() // 1000
     api_costs = api_costs or {}
+    return (
+        ts,
+        subject or '',
+        sender or '',
+        category or 'General Inquiries',
+        float(confidence) if confidence is not None else None,
+        (sentiment or '').upper() if sentiment else None,
+        float(processing_time) if processing_time is not None else None,
+        int(content_length) if content_length is not None else None,
+        float(api_costs.get('openai', 0.0)),
+        float(api_costs.get('huggingface', 0.0)),
+    )
+
+
+def _category_id(conn, name: str) -> int:
+    category_id = _category_ids.get(name)
+    if category_id is None:
+        conn.execute('INSERT OR IGNORE INTO categories (name) VALUES (?)', (name,))
+        category_id = conn.execute('SELECT id FROM categories WHERE name = ?', (name,)).fetchone()[0]
+        _category_ids[name] = category_id
+    return category_id
+
+
+def _insert_many(rows: List[tuple]) -> None:
     with _get_conn() as conn:
-        conn.execute(
-            """
-            INSERT INTO processed_emails (
-                timestamp, subject, sender, category, confidence, sentiment, processing_time,
-                content_length, api_cost_openai, api_cost_huggingface
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                ts,
-                subject or '',
-                sender or '',
-                category or 'General Inquiries',
-                float(confidence) if confidence is not None else None,
-                (sentiment or '').upper() if sentiment else None,
-                float(processing_time) if processing_time is not None else None,
-                int(content_length) if content_length is not None else None,
-                float(api_costs.get('openai', 0.0)),
-                float(api_costs.get('huggingface', 0.0)),
-            ),
-        )
-        conn.commit()
+        conn.execute('BEGIN')
+        try:
+            # Rows carry the category name in position 3; store its id instead
+            rows = [row[:3] + (_category_id(conn, row[3]),) + row[4:] for row in rows]
+            conn.executemany(INSERT_SQL, rows)
+        except Exception:
+            conn.execute('ROLLBACK')
+            # Ids cached during this transaction may have been rolled back with it
+            _category_ids.clear()
+            raise
+        conn.execute('COMMIT')
+
 
+def flush_pending_records() -> None:
+    """Write any buffered records to the database."""
+    global _pending, _flush_timer
+    with _flush_lock:
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+        rows, _pending = _pending, []
+        if rows:
+            _insert_many(rows)
 
-def _rows_to_dicts(cursor, rows) -> List[Dict[str, Any]]:
-    cols = [d[0] for d in cursor.description]
-    return [dict(zip(cols, r)) for r in rows]
+
+def _schedule_flush() -> None:
+    """Start the flush timer unless one is already pending (caller holds _flush_lock)."""
+    global _flush_timer
+    if _flush_timer is None:
+        _flush_timer = threading.Timer(FLUSH_INTERVAL, flush_pending_records)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def record_processed_email(
+    subject: str,
+    sender: str,
+    category: str,
+    confidence: float = None,
+    sentiment: str = None,
+    processing_time: float = None,
+    content_length: int = None,
+    api_costs: Dict[str, float] | None = None,
+) -> None:
+    """Queue a processed email record; buffered records are written in batches."""
+    row = _build_record(subject, sender, category, confidence, sentiment,
+                        processing_time, content_length, api_costs)
+    with _flush_lock:
+        _pending.append(row)
+        due = len(_pending) >= FLUSH_THRESHOLD
+        if not due:
+            _schedule_flush()
+    if due:
+        flush_pending_records()
+
+
+def record_processed_emails_bulk(records: Iterable[Dict[str, Any]]) -> None:
+    """Insert many processed email records (dicts of record_processed_email arguments) in one transaction."""
+    rows = [_build_record(**record) for record in records]
+    if rows:
+        _insert_many(rows)
+
+
+atexit.register(flush_pending_records)
 
 
 def get_processing_statistics(days: int = 30) -> Dict[str, Any]:
     """Aggregate stats over the last N days."""
-    since = (datetime.utcnow() - timedelta(days=days)).isoformat()
-    with _get_conn() as conn:
+    since = time.time_ns() // 1000 - days * 86400 * 1000000
+    flush_pending_records()
+    with _get_conn() as conn, _read_snapshot(conn):
         cur = conn.cursor()
 
         # Totals and averages
@@ -115,59 +295,57 @@ def get_processing_statistics(days: int = 30) -> Dict[str, Any]:
                    AVG(COALESCE(confidence, 0)) AS avg_confidence,
                    AVG(COALESCE(processing_time, 0)) AS avg_processing_time
             FROM processed_emails
-            WHERE timestamp >= ?
+            WHERE timestamp_us >= ?
             """,
             (since,),
         )
-        totals = _rows_to_dicts(cur, cur.fetchall())[0]
-
-        # Last processed timestamp
-        cur.execute(
-            """
-            SELECT timestamp FROM processed_emails
-            ORDER BY timestamp DESC LIMIT 1
-            """
-        )
-        row = cur.fetchone()
-        last_processed = row[0] if row else None
+        totals = dict(cur.fetchone())
 
         # Category breakdown (top categories)
         cur.execute(
             """
-            SELECT category, COUNT(*) AS count
-            FROM processed_emails
-            WHERE timestamp >= ?
-            GROUP BY category
+            SELECT c.name AS category, COUNT(*) AS count
+            FROM processed_emails p
+            JOIN categories c ON c.id = p.category_id
+            WHERE p.timestamp_us >= ?
+            GROUP BY p.category_id
             ORDER BY count DESC
             LIMIT 10
             """,
             (since,),
         )
-        categories = _rows_to_dicts(cur, cur.fetchall())
+        categories = [dict(row) for row in cur.fetchall()]
 
         # Daily counts (for charting)
         cur.execute(
             """
-            SELECT substr(timestamp, 1, 10) AS day, COUNT(*) AS count
+            SELECT day, COUNT(*) AS count
             FROM processed_emails
-            WHERE timestamp >= ?
+            WHERE timestamp_us >= ?
             GROUP BY day
             ORDER BY day ASC
             """,
             (since,),
         )
-        daily_counts = _rows_to_dicts(cur, cur.fetchall())
+        daily_counts = [dict(row) for row in cur.fetchall()]
 
         # Recent emails
         cur.execute(
             """
-            SELECT timestamp, subject, sender, category, confidence, sentiment
-            FROM processed_emails
-            ORDER BY timestamp DESC
+            SELECT p.timestamp_us, p.subject, p.sender, c.name AS category, p.confidence, p.sentiment
+            FROM processed_emails p
+            LEFT JOIN categories c ON c.id = p.category_id
+            ORDER BY p.timestamp_us DESC
             LIMIT 10
             """
         )
-        recent_emails = _rows_to_dicts(cur, cur.fetchall())
+        recent_emails = [
+            {'timestamp': _iso_timestamp(row['timestamp_us']), **{key: row[key] for key in row.keys()[1:]}}
+            for row in cur.fetchall()
+        ]
+
+    # The newest recent email is the last processed one
+    last_processed = recent_emails[0]['timestamp'] if recent_emails else None
 
     return {
         'total_emails': int(totals.get('total_emails', 0) or 0),
@@ -183,7 +361,8 @@ def get_processing_statistics(days: int = 30) -> Dict[str, Any]:
 def get_today_statistics() -> Dict[str, Any]:
     """Quick stats for today."""
     today_prefix = datetime.utcnow().strftime('%Y-%m-%d')
-    with _get_conn() as conn:
+    flush_pending_records()
+    with _get_conn() as conn, _read_snapshot(conn):
         cur = conn.cursor()
 
         cur.execute(
@@ -191,23 +370,24 @@ def get_today_statistics() -> Dict[str, Any]:
             SELECT COUNT(*) AS emails_today,
                    AVG(COALESCE(confidence, 0)) AS avg_confidence
             FROM processed_emails
-            WHERE substr(timestamp, 1, 10) = ?
+            WHERE day = ?
             """,
             (today_prefix,),
         )
-        today = _rows_to_dicts(cur, cur.fetchall())[0]
+        today = dict(cur.fetchone())
 
         cur.execute(
             """
-            SELECT category, COUNT(*) AS count
-            FROM processed_emails
-            WHERE substr(timestamp, 1, 10) = ?
-            GROUP BY category
+            SELECT c.name AS category, COUNT(*) AS count
+            FROM processed_emails p
+            JOIN categories c ON c.id = p.category_id
+            WHERE p.day = ?
+            GROUP BY p.category_id
             ORDER BY count DESC
             """,
             (today_prefix,),
         )
-        categories_today = _rows_to_dicts(cur, cur.fetchall())
+        categories_today = [dict(row) for row in cur.fetchall()]
 
     return {
         'emails_today': int(today.get('emails_today', 0) or 0),
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Sender Rules
+------------
+Categorizes emails whose sender or headers already give the answer (payment
+processors, code-hosting notifications, newsletters) so they skip both the
+sentiment and the categorization API calls.
+
+Custom rules from data/sender_rules.json always apply. The built-in rules are
+off unless enabled with `builtin_rules = true` in the [Sender Rules] section.
+"""
+
+import os
+import re
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+DATA_DIR = os.path.join(os.getcwd(), 'data')
+RULES_PATH = os.path.join(DATA_DIR, 'sender_rules.json')
+
+# (field, pattern, category) - checked in order, first match wins
+DEFAULT_RULES = [
+    ('from', r'@(?:[\w-]+\.)*(?:stripe|paypal|squareup|quickbooks|xero)\.com\b', 'Invoices & Payments'),
+    ('from', r'@(?:[\w-]+\.)*(?:github|gitlab|atlassian)\.(?:com|net)\b', 'System & Notifications'),
+    ('subject', r'\b(?:invoice|receipt|payment\s+(?:due|received|confirmation))\b', 'Invoices & Payments'),
+    ('from', r'(?:^|[<\s])(?:newsletters?|news|marketing|promo(?:tions)?|offers)@', 'Marketing & Promotions'),
+    ('from', r'(?:^|[<\s])(?:mailer-daemon|postmaster|no-?reply|do-?not-?reply)@', 'System & Notifications'),
+]
+
+# Bulk mail that advertises an unsubscribe link, matched no sender rule and is
+# neither a reply nor from a discussion list
+LIST_UNSUBSCRIBE_CATEGORY = 'Marketing & Promotions'
+
+# Subjects of replies and forwards, which are written by a person whatever their topic
+REPLY_SUBJECT_PATTERN = re.compile(r'^\s*(?:re|fwd?|aw|sv)\s*:', re.IGNORECASE)
+
+def builtin_rules_enabled(config) -> bool:
+    """Whether the built-in rules apply in addition to the custom ones."""
+    try:
+        return config.getboolean('Sender Rules', 'builtin_rules', fallback=False)
+    except (AttributeError, ValueError):
+        return False
+
+def rule_headers(msg) -> Dict[str, bool]:
+    """Header flags the rules check, read from a parsed email message."""
+    return {
+        'list_unsubscribe': msg.get('List-Unsubscribe') is not None,
+        'in_reply_to': msg.get('In-Reply-To') is not None,
+        'list_post': msg.get('List-Post') is not None,
+    }
+
+def is_reply(email_data: Dict[str, Any]) -> bool:
+    """Whether an email is a reply or forward rather than an original message."""
+    return bool(email_data.get('in_reply_to')) or bool(REPLY_SUBJECT_PATTERN.match(email_data.get('subject') or ''))
+
+class SenderRules:
+    """Header-based categorization rules evaluated before any API call."""
+
+    def __init__(self, rules_path: str = RULES_PATH):
+        self.rules_path = rules_path
+        self.custom_rules = self._compile(self._load_custom_rules())
+        self.builtin_rules = self._compile(DEFAULT_RULES)
+
+    def _load_custom_rules(self) -> List[Tuple[str, str, str]]:
+        """Load user rules (a JSON list of {"field", "pattern", "category"} objects).
+
+        Custom rules take precedence over the built-in defaults.
+        """
+        try:
+            with open(self.rules_path, 'r') as f:
+                entries = json.load(f)
+        except OSError:
+            return []
+        except ValueError as e:
+            print(f"Error reading sender rules from {self.rules_path}: {e}")
+            return []
+
+        return [(entry.get('field', 'from'), entry['pattern'], entry['category'])
+                for entry in entries if 'pattern' in entry and 'category' in entry]
+
+    def _compile(self, rules: List[Tuple[str, str, str]]) -> List[Tuple[str, Any, str]]:
+        """Compile rule patterns once, skipping invalid ones."""
+        compiled = []
+        for field, pattern, category in rules:
+            try:
+                compiled.append((field, re.compile(pattern, re.IGNORECASE), category))
+            except re.error as e:
+                print(f"Ignoring invalid sender rule {pattern!r}: {e}")
+        return compiled
+
+    def match(self, email_data: Dict[str, Any], config=None) -> Optional[str]:
+        """Return the category for an email if a rule matches, otherwise None."""
+        for field, pattern, category in self.custom_rules:
+            if pattern.search(email_data.get(field) or ''):
+                return category
+
+        if not builtin_rules_enabled(config):
+            return None
+
+        # "Re: question about your invoice" is correspondence, not a billing notice
+        reply = is_reply(email_data)
+        for field, pattern, category in self.builtin_rules:
+            if field == 'subject' and reply:
+                continue
+            if pattern.search(email_data.get(field) or ''):
+                return category
+
+        # Discussion lists (which accept posts) send List-Unsubscribe too
+        if email_data.get('list_unsubscribe') and not email_data.get('list_post') and not reply:
+            return LIST_UNSUBSCRIBE_CATEGORY
+
+        return None
+
+# Global sender rules instance
+sender_rules = SenderRules()
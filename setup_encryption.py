@@ -18,9 +18,11 @@ def main():
     
     cm = CredentialManager()
     
-    # Check current state
-    has_plaintext = os.path.exists('config.ini')
-    has_encrypted = os.path.exists('config.encrypted')
+    # Check current state (one directory scan instead of a stat per file)
+    with os.scandir('.') as entries:
+        names = {entry.name for entry in entries}
+    has_plaintext = 'config.ini' in names
+    has_encrypted = 'config.encrypted' in names
     
     if has_encrypted and not has_plaintext:
         print("✅ Encrypted configuration already set up.")
@@ -5,18 +5,71 @@ Email Provider Setup Wizard
 Interactive setup wizard for configuring email providers.
 """
 
+import csv
 import os
+import re
+import shutil
 import sys
-import configparser
+from concurrent.futures import ThreadPoolExecutor
 from email_providers import provider_manager, detect_email_provider
-from credential_manager import CredentialManager
+
+# local@domain.tld with no whitespace or extra '@'
+EMAIL_PATTERN = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')
+
+# config.ini written by the wizard, in the layout ConfigParser.write() produces;
+# the API key sections are placeholders for the user to fill in
+CONFIG_TEMPLATE = """[IMAP]
+server = {server}
+port = {port}
+username = {email}
+password = {password}
+
+[Hugging Face]
+api_key = your-huggingface-api-key-here
+
+[OpenAI]
+api_key = your-openai-api-key-here
+
+"""
+
+# Upper bound on simultaneous IMAP logins when checking a batch of accounts
+MAX_BATCH_CONNECTIONS = 32
+
+# Replies accepted as "yes" at (Y/n) prompts; Enter alone accepts the default
+YES_ANSWERS = frozenset(('', 'y', 'yes'))
+
+# Folders the categorizer moves emails into; they must exist before the first run
+REQUIRED_FOLDERS = (
+    "Client Communication", "Completed & Archived", "Follow-Up Required",
+    "General Inquiries", "Invoices & Payments", "Marketing & Promotions",
+    "Pending & To Be Actioned", "Personal & Non-Business", "Reports & Documents",
+    "Spam & Unwanted", "System & Notifications", "Urgent & Time-Sensitive"
+)
 
 class ProviderSetupWizard:
     """Interactive setup wizard for email providers."""
     
     def __init__(self):
-        self.config = configparser.ConfigParser()
+        # Imported here so --provider-info does not load the cryptography stack
+        from credential_manager import CredentialManager
+        
         self.credential_manager = CredentialManager()
+        self._config_cache = {}
+        self._providers = None
+    
+    def _provider_config(self, provider_id):
+        """Get a provider configuration, looked up once per wizard run."""
+        config = self._config_cache.get(provider_id)
+        if config is None:
+            config = provider_manager.get_provider_config(provider_id)
+            self._config_cache[provider_id] = config
+        return config
+    
+    def _supported_providers(self):
+        """Get the supported provider listing, built once per wizard run."""
+        if self._providers is None:
+            self._providers = provider_manager.list_supported_providers()
+        return self._providers
     
     def run_setup(self):
         """Run the complete setup wizard."""
@@ -32,7 +85,7 @@ class ProviderSetupWizard:
         provider_id = self._detect_and_confirm_provider(email)
         
         # Step 3: Get provider configuration
-        provider_config = provider_manager.get_provider_config(provider_id)
+        provider_config = self._provider_config(provider_id)
         
         # Step 4: Display setup instructions
         self._show_setup_instructions(provider_id, email)
@@ -53,14 +106,14 @@ class ProviderSetupWizard:
         """Get email address from user."""
         while True:
             email = input("Enter your email address: ").strip()
-            if '@' in email and '.' in email.split('@')[1]:
+            if EMAIL_PATTERN.fullmatch(email):
                 return email
             print("Please enter a valid email address.")
     
     def _detect_and_confirm_provider(self, email):
         """Detect provider and confirm with user."""
         detected_provider = detect_email_provider(email)
-        provider_config = provider_manager.get_provider_config(detected_provider)
+        provider_config = self._provider_config(detected_provider)
         
         print(f"\n📧 Detected email provider: {provider_config.name}")
         
@@ -69,7 +122,7 @@ class ProviderSetupWizard:
             return self._select_provider_manually()
         
         confirm = input(f"Is this correct? (Y/n): ").strip().lower()
-        if confirm in ['', 'y', 'yes']:
+        if confirm in YES_ANSWERS:
             return detected_provider
         else:
             return self._select_provider_manually()
@@ -77,7 +130,10 @@ class ProviderSetupWizard:
     def _select_provider_manually(self):
         """Let user manually select provider."""
         print("\nSupported providers:")
-        providers = provider_manager.list_supported_providers()
+        providers = self._supported_providers()
+        
+        choices = {i: provider['id'] for i, provider in enumerate(providers, 1)}
+        choices[len(providers) + 1] = 'generic'
         
         for i, provider in enumerate(providers, 1):
             print(f"{i}. {provider['name']}")
@@ -85,37 +141,39 @@ class ProviderSetupWizard:
         
         while True:
             try:
-                choice = int(input(f"\nSelect provider (1-{len(providers) + 1}): "))
-                if 1 <= choice <= len(providers):
-                    return providers[choice - 1]['id']
-                elif choice == len(providers) + 1:
-                    return 'generic'
-                else:
-                    print("Invalid choice. Please try again.")
+                choice = int(input(f"\nSelect provider (1-{len(choices)}): "))
             except ValueError:
                 print("Please enter a number.")
+                continue
+            
+            provider_id = choices.get(choice)
+            if provider_id:
+                return provider_id
+            print("Invalid choice. Please try again.")
     
     def _show_setup_instructions(self, provider_id, email):
         """Show provider-specific setup instructions."""
         instructions = provider_manager.get_setup_instructions(provider_id)
         
-        print(f"\n📋 Setup Instructions for {instructions['provider']}:")
-        print("=" * 50)
+        # Build the whole section first and write it in one go
+        lines = [f"\n📋 Setup Instructions for {instructions['provider']}:", "=" * 50]
         
         if provider_id == 'generic':
-            print("You'll need to provide custom IMAP server settings.")
+            lines.append("You'll need to provide custom IMAP server settings.")
         else:
-            print(f"IMAP Server: {instructions['imap_server']}")
-            print(f"IMAP Port: {instructions['imap_port']}")
-            print(f"SSL Required: {instructions['ssl_required']}")
-            print(f"Authentication: {instructions['authentication']}")
+            lines += [
+                f"IMAP Server: {instructions['imap_server']}",
+                f"IMAP Port: {instructions['imap_port']}",
+                f"SSL Required: {instructions['ssl_required']}",
+                f"Authentication: {instructions['authentication']}"
+            ]
         
         if instructions.get('notes'):
-            print("\n⚠️  Important Notes:")
-            for note in instructions['notes']:
-                print(f"   • {note}")
+            lines.append("\n⚠️  Important Notes:")
+            lines += [f"   • {note}" for note in instructions['notes']]
         
-        print("\n" + "=" * 50)
+        lines.append("\n" + "=" * 50)
+        print("\n".join(lines))
     
     def _get_provider_credentials(self, provider_config, email):
         """Get credentials and server settings from user."""
@@ -131,7 +189,7 @@ class ProviderSetupWizard:
         # Password
         print(f"\nPassword for {email}:")
         
-        if provider_config.quirks.get('app_password_required'):
+        if provider_config.quirks.app_password_required:
             print("⚠️  This provider requires an app-specific password.")
             print("   Do not use your regular account password.")
             password = input("Enter app-specific password: ").strip()
@@ -160,100 +218,138 @@ class ProviderSetupWizard:
     
     def _show_troubleshooting_tips(self, provider_id):
         """Show troubleshooting tips for connection failures."""
-        print("\n🔧 Troubleshooting Tips:")
+        lines = ["\n🔧 Troubleshooting Tips:"]
         
-        provider_config = provider_manager.get_provider_config(provider_id)
+        provider_config = self._provider_config(provider_id)
         
-        if provider_config.quirks.get('app_password_required'):
-            print("   • Make sure you're using an app-specific password, not your regular password")
-            print("   • Check that app passwords are enabled in your account settings")
+        if provider_config.quirks.app_password_required:
+            lines.append("   • Make sure you're using an app-specific password, not your regular password")
+            lines.append("   • Check that app passwords are enabled in your account settings")
         
         if provider_id == 'gmail':
-            print("   • Enable 'Less secure app access' or use app passwords")
-            print("   • Check that 2-factor authentication is properly configured")
+            lines.append("   • Enable 'Less secure app access' or use app passwords")
+            lines.append("   • Check that 2-factor authentication is properly configured")
         
         elif provider_id == 'outlook':
-            print("   • Ensure IMAP is enabled in your Outlook.com settings")
-            print("   • Try using OAuth2 if available")
+            lines.append("   • Ensure IMAP is enabled in your Outlook.com settings")
+            lines.append("   • Try using OAuth2 if available")
         
         elif provider_id == 'yahoo':
-            print("   • Generate an app password in Yahoo Account Security")
-            print("   • Make sure IMAP access is enabled")
+            lines.append("   • Generate an app password in Yahoo Account Security")
+            lines.append("   • Make sure IMAP access is enabled")
         
-        print("   • Check your internet connection and firewall settings")
-        print("   • Verify the email address and password are correct")
+        lines.append("   • Check your internet connection and firewall settings")
+        lines.append("   • Verify the email address and password are correct")
+        print("\n".join(lines))
     
     def _save_configuration(self, provider_config, email, password, server, port):
         """Save configuration to file."""
         print("\n💾 Saving configuration...")
         
-        # Create configuration
-        self.config['IMAP'] = {
-            'server': server,
-            'port': str(port),
-            'username': email,
-            'password': password
-        }
-        
-        # Add placeholder sections for APIs
-        if not self.config.has_section('Hugging Face'):
-            self.config['Hugging Face'] = {
-                'api_key': 'your-huggingface-api-key-here'
-            }
+        # Render first so re-running setup with the same values leaves the file alone
+        data = CONFIG_TEMPLATE.format(server=server, port=port, email=email, password=password)
         
-        if not self.config.has_section('OpenAI'):
-            self.config['OpenAI'] = {
-                'api_key': 'your-openai-api-key-here'
-            }
-        
-        # Save to file
-        with open('config.ini', 'w') as f:
-            self.config.write(f)
+        try:
+            with open('config.ini', 'r') as f:
+                unchanged = f.read() == data
+        except OSError:
+            unchanged = False
         
-        print("✅ Configuration saved to config.ini")
+        if unchanged:
+            print("✅ Configuration unchanged")
+        else:
+            # Write to a temporary file and swap it in so a crash never leaves a torn config
+            # The file holds the IMAP password: create it owner-only and keep an existing file's mode
+            tmp_path = 'config.ini.tmp'
+            try:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)  # O_CREAT would keep a leftover file's mode
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, 'w') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if os.path.exists('config.ini'):
+                    shutil.copymode('config.ini', tmp_path)
+                os.replace(tmp_path, 'config.ini')
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            print("✅ Configuration saved to config.ini")
         
         # Encrypt configuration
         encrypt_choice = input("\n🔒 Encrypt configuration for security? (Y/n): ").strip().lower()
-        if encrypt_choice in ['', 'y', 'yes']:
+        if encrypt_choice in YES_ANSWERS:
             success = self.credential_manager.migrate_from_plaintext()
-            if success:
-                print("✅ Configuration encrypted successfully!")
-            else:
-                print("⚠️  Encryption failed, but plaintext config is available.")
+            print("✅ Configuration encrypted successfully!" if success
+                  else "⚠️  Encryption failed, but plaintext config is available.")
         
         # Show next steps
         self._show_next_steps()
     
     def _show_next_steps(self):
         """Show next steps after setup."""
-        print("\n🚀 Next Steps:")
-        print("=" * 30)
-        print("1. Add your HuggingFace API key to the configuration")
-        print("2. Add your OpenAI API key to the configuration")
-        print("3. Create the required email folders in your email client")
-        print("4. Run the email categorizer: python3 email_categorizer.py")
-        print()
-        print("📂 Required email folders:")
-        for category in [
-            "Client Communication", "Completed & Archived", "Follow-Up Required",
-            "General Inquiries", "Invoices & Payments", "Marketing & Promotions",
-            "Pending & To Be Actioned", "Personal & Non-Business", "Reports & Documents",
-            "Spam & Unwanted", "System & Notifications", "Urgent & Time-Sensitive"
-        ]:
-            print(f"   • {category}")
+        lines = [
+            "\n🚀 Next Steps:",
+            "=" * 30,
+            "1. Add your HuggingFace API key to the configuration",
+            "2. Add your OpenAI API key to the configuration",
+            "3. Create the required email folders in your email client",
+            "4. Run the email categorizer: python3 email_categorizer.py",
+            "",
+            "📂 Required email folders:"
+        ]
+        lines += [f"   • {category}" for category in REQUIRED_FOLDERS]
+        print("\n".join(lines))
+
+def _test_account(account):
+    """Test one (email, provider_id, server, port, password) account."""
+    email, provider_id, server, port, password = (list(account) + [''] * 5)[:5]
+    provider_id = provider_id or detect_email_provider(email, server or None)
+    try:
+        port = int(port) if port else None
+    except ValueError:
+        return False, f"Invalid port: {port}"
+    return provider_manager.test_connection(provider_id, email, password, server or None, port)
+
+def test_connections_batch(accounts):
+    """Test many accounts concurrently; results are returned in input order."""
+    if not accounts:
+        return []
+    
+    # Each probe is a blocking login that mostly waits on the network
+    with ThreadPoolExecutor(max_workers=min(MAX_BATCH_CONNECTIONS, len(accounts))) as executor:
+        return list(executor.map(_test_account, accounts))
 
 def main():
     """Main function."""
-    if len(sys.argv) > 1 and sys.argv[1] == '--provider-info':
+    if len(sys.argv) > 2 and sys.argv[1] == '--batch':
+        # Test every account in a CSV file: email,provider_id,server,port,password
+        # (empty provider_id/server/port fall back to the detected provider's defaults)
+        with open(sys.argv[2], newline='') as f:
+            accounts = [row for row in csv.reader(f) if row and not row[0].startswith('#')]
+        
+        print(f"🔄 Testing {len(accounts)} account(s)...")
+        results = test_connections_batch(accounts)
+        lines = [f"{'✅' if success else '❌'} {account[0]}: {message}"
+                 for account, (success, message) in zip(accounts, results)]
+        passed = sum(success for success, _ in results)
+        lines.append(f"\n{passed}/{len(results)} connection(s) successful")
+        print("\n".join(lines))
+        sys.exit(0 if passed == len(results) else 1)
+    elif len(sys.argv) > 1 and sys.argv[1] == '--provider-info':
         # Show provider information
-        print("Supported Email Providers:")
-        print("=" * 50)
+        lines = ["Supported Email Providers:", "=" * 50]
         for provider in provider_manager.list_supported_providers():
-            print(f"• {provider['name']}")
-            print(f"  Server: {provider['server']}")
-            print(f"  OAuth2: {'Yes' if provider['oauth2_supported'] else 'No'}")
-            print(f"  App Password: {'Required' if provider['app_password_required'] else 'Not required'}")
-            print()
+            lines += [
+                f"• {provider['name']}",
+                f"  Server: {provider['server']}",
+                f"  OAuth2: {'Yes' if provider['oauth2_supported'] else 'No'}",
+                f"  App Password: {'Required' if provider['app_password_required'] else 'Not required'}",
+                ""
+            ]
+        sys.stdout.write("\n".join(lines) + "\n")
     else:
         # Run setup wizard
         wizard = ProviderSetupWizard()
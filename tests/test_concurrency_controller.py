@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Tests for the adaptive per-API concurrency limit."""
+
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import email_categorizer_dry_run as dry_run
+from api_rate_limiter import APIRateLimiter, ConcurrencyController
+
+class ConcurrencyControllerTest(unittest.TestCase):
+
+    def test_throttle_halves_limit(self):
+        controller = ConcurrencyController(initial_limit=8, max_limit=8)
+        controller.on_throttle()
+        self.assertEqual(controller.current_limit, 4)
+        controller.on_throttle()
+        self.assertEqual(controller.current_limit, 2)
+        self.assertIsNotNone(controller.last_throttle)
+
+    def test_throttle_stops_at_min_limit(self):
+        controller = ConcurrencyController(initial_limit=3, min_limit=1)
+        for _ in range(5):
+            controller.on_throttle()
+        self.assertEqual(controller.current_limit, 1)
+
+    def test_ten_successes_raise_limit_by_one(self):
+        controller = ConcurrencyController(initial_limit=2, max_limit=8, ramp_up_after=10)
+        for _ in range(9):
+            controller.on_success()
+        self.assertEqual(controller.current_limit, 2)
+        controller.on_success()
+        self.assertEqual(controller.current_limit, 3)
+        for _ in range(10):
+            controller.on_success()
+        self.assertEqual(controller.current_limit, 4)
+
+    def test_throttle_resets_success_streak(self):
+        controller = ConcurrencyController(initial_limit=4, max_limit=8, ramp_up_after=10)
+        for _ in range(9):
+            controller.on_success()
+        controller.on_throttle()
+        controller.on_success()
+        self.assertEqual(controller.current_limit, 2)
+
+    def test_limit_never_exceeds_max(self):
+        controller = ConcurrencyController(initial_limit=2, max_limit=3, ramp_up_after=1)
+        for _ in range(5):
+            controller.on_success()
+        self.assertEqual(controller.current_limit, 3)
+
+    def test_slot_blocks_beyond_limit(self):
+        controller = ConcurrencyController(initial_limit=1)
+        entered = threading.Event()
+
+        def worker():
+            with controller.slot():
+                entered.set()
+
+        with controller.slot():
+            thread = threading.Thread(target=worker)
+            thread.start()
+            self.assertFalse(entered.wait(0.1))
+        self.assertTrue(entered.wait(1))
+        thread.join()
+        self.assertEqual(controller.in_flight, 0)
+
+    def test_controller_follows_burst_size(self):
+        limiter = APIRateLimiter()
+        controller = limiter.get_concurrency_controller('openai')
+        self.assertIs(limiter.get_concurrency_controller('openai'), controller)
+        self.assertEqual(controller.current_limit, limiter.rate_limits['openai'].burst_size)
+
+def fake_response(status, retried_statuses=()):
+    history = tuple(SimpleNamespace(status=code) for code in retried_statuses)
+    return SimpleNamespace(status_code=status, raw=SimpleNamespace(retries=SimpleNamespace(history=history)))
+
+class DryRunPostTest(unittest.TestCase):
+
+    def setUp(self):
+        self.limiter = APIRateLimiter()
+        patcher = mock.patch.object(dry_run, 'rate_limiter', self.limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, response):
+        with mock.patch.object(dry_run.HTTP_SESSION, 'post', return_value=response):
+            return dry_run._post_api('openai', dry_run.OPENAI_API_URL, {}, {})
+
+    def test_retried_429_halves_limit(self):
+        controller = self.limiter.get_concurrency_controller('openai')
+        controller.current_limit = 4
+        self.post(fake_response(200, retried_statuses=(429,)))
+        self.assertEqual(controller.current_limit, 2)
+
+    def test_final_429_halves_limit(self):
+        controller = self.limiter.get_concurrency_controller('openai')
+        controller.current_limit = 4
+        self.post(fake_response(429, retried_statuses=(429, 429)))
+        self.assertEqual(controller.current_limit, 2)
+
+    def test_successes_raise_limit(self):
+        controller = self.limiter.get_concurrency_controller('openai')
+        start = controller.current_limit
+        for _ in range(controller.ramp_up_after):
+            self.post(fake_response(200))
+        self.assertEqual(controller.current_limit, start + 1)
+        self.assertEqual(controller.in_flight, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Tests for the IMAP IDLE wait and mid-cycle mail detection in the continuous monitor."""
+
+import socket
+import unittest
+
+from email_categorizer_continuous import _idle_wait, _pop_new_mail_responses
+
+class FakeSocket:
+    """Socket that replays scripted recv() results; `socket.timeout` entries are raised."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.timeout = 30.0
+
+    def gettimeout(self):
+        return self.timeout
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def recv(self, size):
+        item = self.script.pop(0)
+        if item is socket.timeout:
+            raise socket.timeout()
+        return item
+
+class FakeIMAP:
+    """Just enough of imaplib.IMAP4 for _idle_wait and _pop_new_mail_responses."""
+
+    def __init__(self, script=()):
+        self.sock = FakeSocket(script)
+        self.sent = []
+        self.untagged_responses = {}
+
+    def _new_tag(self):
+        return b'A001'
+
+    def send(self, data):
+        self.sent.append(data)
+
+class IdleWaitTest(unittest.TestCase):
+
+    def test_new_mail_ends_idle(self):
+        mail = FakeIMAP([
+            b'+ idling\r\n',
+            b'* 4 EXI', b'STS\r\n',
+            b'A001 OK IDLE terminated\r\n',
+        ])
+        self.assertTrue(_idle_wait(mail, timeout=5))
+        self.assertEqual(mail.sent, [b'A001 IDLE\r\n', b'DONE\r\n'])
+        self.assertEqual(mail.sock.timeout, 30.0)
+
+    def test_timeout_sends_done_and_drains(self):
+        mail = FakeIMAP([
+            b'+ idling\r\n',
+            socket.timeout,
+            b'* 1 EXPUNGE\r\nA001 OK IDLE terminated\r\n',
+        ])
+        self.assertFalse(_idle_wait(mail, timeout=5))
+        self.assertEqual(mail.sent, [b'A001 IDLE\r\n', b'DONE\r\n'])
+        self.assertEqual(mail.sock.script, [])
+
+    def test_mail_announced_while_leaving_idle_is_reported(self):
+        mail = FakeIMAP([
+            b'+ idling\r\n',
+            socket.timeout,
+            b'* 7 EXISTS\r\n',
+            b'A001 OK IDLE terminated\r\n',
+        ])
+        self.assertTrue(_idle_wait(mail, timeout=5))
+
+    def test_rejected_idle_raises(self):
+        mail = FakeIMAP([b'A001 BAD unknown command\r\n'])
+        with self.assertRaises(Exception):
+            _idle_wait(mail, timeout=5)
+        self.assertEqual(mail.sock.timeout, 30.0)
+
+class PendingResponsesTest(unittest.TestCase):
+
+    def test_exists_is_popped(self):
+        mail = FakeIMAP()
+        mail.untagged_responses = {'EXISTS': [b'12'], 'FLAGS': [b'(\\Seen)']}
+        self.assertTrue(_pop_new_mail_responses(mail))
+        self.assertEqual(mail.untagged_responses, {'FLAGS': [b'(\\Seen)']})
+        self.assertFalse(_pop_new_mail_responses(mail))
+
+    def test_zero_recent_is_not_new_mail(self):
+        mail = FakeIMAP()
+        mail.untagged_responses = {'RECENT': [b'0']}
+        self.assertFalse(_pop_new_mail_responses(mail))
+        self.assertNotIn('RECENT', mail.untagged_responses)
+
+    def test_nonzero_recent_is_new_mail(self):
+        mail = FakeIMAP()
+        mail.untagged_responses = {'RECENT': [b'0', b'2']}
+        self.assertTrue(_pop_new_mail_responses(mail))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Tests for COMPRESS=DEFLATE support against a fake IMAP server stream."""
+
+import imaplib
+import unittest
+import zlib
+
+from email_categorizer import enable_imap_compression
+
+MESSAGE = b''.join(
+    b'Line %d of a long message body with some repeated text to compress.\r\n' % i
+    for i in range(3000)
+)
+
+class FakeServerSocket:
+    """In-memory IMAP server that answers each command line as it is sent.
+
+    Once COMPRESS is accepted, both directions are raw deflate streams. recv()
+    hands out at most `chunk_size` bytes so responses arrive in partial reads.
+    """
+
+    def __init__(self, capabilities=b'IMAP4rev1 COMPRESS=DEFLATE', chunk_size=7):
+        self.capabilities = capabilities
+        self.chunk_size = chunk_size
+        self.compressed = False
+        self.compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        self.decompressor = zlib.decompressobj(-15)
+        self.incoming = b''
+        self.outgoing = bytearray(b'* PREAUTH fake server ready\r\n')
+        self.commands = []
+
+    def _reply(self, data):
+        if self.compressed:
+            data = self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.outgoing.extend(data)
+
+    def sendall(self, data):
+        if self.compressed:
+            data = self.decompressor.decompress(data)
+        self.incoming += data
+        while b'\r\n' in self.incoming:
+            line, self.incoming = self.incoming.split(b'\r\n', 1)
+            self._handle(line)
+
+    def _handle(self, line):
+        tag, command = line.split(b' ', 2)[:2]
+        command = command.upper()
+        self.commands.append(command)
+        if command == b'CAPABILITY':
+            self._reply(b'* CAPABILITY ' + self.capabilities + b'\r\n' + tag + b' OK done\r\n')
+        elif command == b'COMPRESS':
+            self._reply(tag + b' OK DEFLATE active\r\n')
+            self.compressed = True
+        elif command == b'SELECT':
+            self._reply(b'* 1 EXISTS\r\n' + tag + b' OK [READ-WRITE] SELECT completed\r\n')
+        elif command == b'FETCH':
+            self._reply(b'* 1 FETCH (RFC822 {%d}\r\n' % len(MESSAGE) + MESSAGE + b')\r\n')
+            self._reply(tag + b' OK FETCH completed\r\n')
+        elif command == b'NOOP':
+            self._reply(b'* 2 EXISTS\r\n' + tag + b' OK NOOP completed\r\n')
+        else:
+            self._reply(tag + b' BAD unknown command\r\n')
+
+    def recv(self, size):
+        size = min(size, self.chunk_size)
+        data = bytes(self.outgoing[:size])
+        del self.outgoing[:size]
+        return data
+
+    def close(self):
+        pass
+
+class PlainReader:
+    """Unbuffered stand-in for the socket file imaplib reads before compression starts."""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def readline(self, limit=-1):
+        line = b''
+        while not line.endswith(b'\n'):
+            line += self.sock.recv(1)
+        return line
+
+    def read(self, size):
+        data = b''
+        while len(data) < size:
+            data += self.sock.recv(size - len(data))
+        return data
+
+    def close(self):
+        pass
+
+class FakeIMAP(imaplib.IMAP4):
+    """imaplib.IMAP4 talking to a FakeServerSocket instead of the network."""
+
+    def __init__(self, server):
+        self.server = server
+        super().__init__()
+
+    def open(self, host='', port=imaplib.IMAP4_PORT, timeout=None):
+        self.host = host
+        self.port = port
+        self.sock = self.server
+        self.file = PlainReader(self.server)
+
+    def send(self, data):
+        self.sock.sendall(data)
+
+class CompressionTest(unittest.TestCase):
+
+    def test_compressed_fetch_round_trip(self):
+        server = FakeServerSocket()
+        mail = FakeIMAP(server)
+        self.assertTrue(enable_imap_compression(mail))
+        self.assertTrue(server.compressed)
+
+        result, _ = mail.select('INBOX')
+        self.assertEqual(result, 'OK')
+
+        result, data = mail.fetch('1', '(RFC822)')
+        self.assertEqual(result, 'OK')
+        self.assertEqual(data[0][0], b'1 (RFC822 {%d}' % len(MESSAGE))
+        self.assertEqual(data[0][1], MESSAGE)
+        self.assertEqual(data[1], b')')
+
+        # Commands sent after negotiation reached the server deflated and intact
+        self.assertEqual(server.commands, [b'CAPABILITY', b'CAPABILITY', b'COMPRESS', b'SELECT', b'FETCH'])
+
+    def test_large_reads_consume_partial_chunks(self):
+        server = FakeServerSocket(chunk_size=1)
+        mail = FakeIMAP(server)
+        self.assertTrue(enable_imap_compression(mail))
+        mail.select('INBOX')
+        result, data = mail.fetch('1', '(RFC822)')
+        self.assertEqual(result, 'OK')
+        self.assertEqual(data[0][1], MESSAGE)
+
+    def test_raw_recv_inflates(self):
+        server = FakeServerSocket()
+        mail = FakeIMAP(server)
+        enable_imap_compression(mail)
+
+        # IDLE reads the socket directly through mail._recv
+        mail.send(b'A900 NOOP\r\n')
+        received = b''
+        while not received.endswith(b'A900 OK NOOP completed\r\n'):
+            received += mail._recv(4096)
+        self.assertEqual(received, b'* 2 EXISTS\r\nA900 OK NOOP completed\r\n')
+
+    def test_server_without_compress_is_left_alone(self):
+        server = FakeServerSocket(capabilities=b'IMAP4rev1')
+        mail = FakeIMAP(server)
+        self.assertFalse(enable_imap_compression(mail))
+        self.assertFalse(server.compressed)
+        self.assertNotIn(b'COMPRESS', server.commands)
+        self.assertEqual(mail.select('INBOX')[0], 'OK')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Tests for sender rules and for emails settled by them skipping both API calls."""
+
+import configparser
+import email
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import email_categorizer
+from sender_rules import SenderRules, rule_headers
+
+RULE_EMAIL = b"From: billing@stripe.com\r\nSubject: Your receipt\r\n\r\nThanks for your payment.\r\n"
+API_EMAIL = b"From: alice@example.org\r\nSubject: Lunch?\r\n\r\nAre you free on Friday?\r\n"
+
+def make_config(builtin_rules):
+    config = configparser.ConfigParser()
+    config.read_dict({'Sender Rules': {'builtin_rules': str(builtin_rules).lower()}})
+    return config
+
+class SenderRulesTest(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.rules_path = os.path.join(tmpdir.name, 'sender_rules.json')
+        self.rules = SenderRules(rules_path=self.rules_path)
+        self.enabled = make_config(True)
+
+    def make_rules(self, custom):
+        """SenderRules loading `custom` (a JSON string) as the rules file."""
+        with open(self.rules_path, 'w') as f:
+            f.write(custom)
+        return SenderRules(rules_path=self.rules_path)
+
+    def test_builtin_rules_are_off_by_default(self):
+        email_data = {'from': 'billing@stripe.com', 'subject': 'Your receipt'}
+        self.assertIsNone(self.rules.match(email_data))
+        self.assertIsNone(self.rules.match(email_data, make_config(False)))
+        self.assertEqual(self.rules.match(email_data, self.enabled), 'Invoices & Payments')
+
+    def test_custom_rules_apply_without_the_flag(self):
+        rules = self.make_rules('[{"field": "subject", "pattern": "^\\\\[JIRA\\\\]", "category": "System & Notifications"}]')
+        self.assertEqual(rules.match({'from': 'x@example.com', 'subject': '[JIRA] PROJ-1'}), 'System & Notifications')
+
+    def test_subject_rule_skips_replies_and_forwards(self):
+        for subject in ('Re: receipt of the signed contract', 'FWD: invoice attached', 'Re:Re: payment received'):
+            self.assertIsNone(self.rules.match({'from': 'bob@example.org', 'subject': subject}, self.enabled), subject)
+
+    def test_subject_rule_skips_mail_with_in_reply_to(self):
+        email_data = {'from': 'bob@example.org', 'subject': 'question about your invoice', 'in_reply_to': True}
+        self.assertIsNone(self.rules.match(email_data, self.enabled))
+
+    def test_subject_rule_matches_original_mail(self):
+        email_data = {'from': 'bob@example.org', 'subject': 'Invoice #123 for March'}
+        self.assertEqual(self.rules.match(email_data, self.enabled), 'Invoices & Payments')
+
+    def test_sender_rule_still_applies_to_replies(self):
+        email_data = {'from': 'notifications@github.com', 'subject': 'Re: [org/repo] Fix build', 'in_reply_to': True}
+        self.assertEqual(self.rules.match(email_data, self.enabled), 'System & Notifications')
+
+    def test_list_unsubscribe_files_bulk_mail_as_marketing(self):
+        email_data = {'from': 'Shop <hello@shop.example>', 'subject': 'Spring sale', 'list_unsubscribe': True}
+        self.assertEqual(self.rules.match(email_data, self.enabled), 'Marketing & Promotions')
+        self.assertIsNone(self.rules.match(email_data))
+
+    def test_list_unsubscribe_skips_discussion_lists(self):
+        email_data = {'from': 'Ann <ann@team.example>', 'subject': 'Release plan',
+                      'list_unsubscribe': True, 'list_post': True}
+        self.assertIsNone(self.rules.match(email_data, self.enabled))
+
+    def test_list_unsubscribe_skips_replies(self):
+        for extra in ({'subject': 'Re: Release plan'}, {'subject': 'Release plan', 'in_reply_to': True}):
+            email_data = {'from': 'Ann <ann@team.example>', 'list_unsubscribe': True, **extra}
+            self.assertIsNone(self.rules.match(email_data, self.enabled), extra)
+
+    def test_rule_headers_reads_list_and_reply_headers(self):
+        msg = email.message_from_string(
+            "From: ann@team.example\nSubject: Release plan\nList-Unsubscribe: <mailto:leave@team.example>\n"
+            "List-Post: <mailto:dev@team.example>\n\nbody\n")
+        self.assertEqual(rule_headers(msg), {'list_unsubscribe': True, 'in_reply_to': False, 'list_post': True})
+
+class FakeMail:
+    """Mailbox holding numbered raw messages; UIDs are the numbers plus 100."""
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    def fetch(self, num, spec):
+        if spec == '(UID)':
+            return 'OK', [b'%s (UID %d)' % (num, int(num) + 100)]
+        return 'OK', [(b'%s (RFC822)' % num, self.messages[num])]
+
+class BatchModeRuleSplitTest(unittest.TestCase):
+
+    def run_batch(self, messages):
+        moves = []
+        with mock.patch.object(email_categorizer, 'process_emails_in_batches', return_value=[]) as batches, \
+             mock.patch.object(email_categorizer, 'move_email_with_retry',
+                               side_effect=lambda mail, uid, category, config: moves.append((uid, category)) or True), \
+             mock.patch('builtins.print'):
+            ok = email_categorizer._process_emails_batch_mode(FakeMail(messages), list(messages), make_config(True), 10)
+        return ok, batches, moves
+
+    def test_rule_matches_never_reach_the_batch_apis(self):
+        ok, batches, moves = self.run_batch({b'1': RULE_EMAIL, b'2': API_EMAIL})
+        self.assertTrue(ok)
+        api_emails = batches.call_args[0][0]
+        self.assertEqual([e['email_num'] for e in api_emails], [b'2'])
+        self.assertEqual(moves, [('101', 'Invoices & Payments')])
+
+    def test_all_rule_matches_skip_batching(self):
+        ok, batches, moves = self.run_batch({b'1': RULE_EMAIL})
+        self.assertTrue(ok)
+        batches.assert_not_called()
+        self.assertEqual(moves, [('101', 'Invoices & Payments')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Tests that failed sentiment analysis is distinguishable from a real NEUTRAL result."""
+
+import configparser
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import email_categorizer
+
+def make_config():
+    config = configparser.ConfigParser()
+    config.read_dict({'Hugging Face': {'api_key': 'test'}, 'OpenAI': {'api_key': 'test'}})
+    return config
+
+def api_response(status_code, payload=None):
+    response = SimpleNamespace(status_code=status_code, text='error', json=lambda: payload)
+    return SimpleNamespace(data=response, cached=False)
+
+class SentimentFallbackTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(email_categorizer, '_get_local_sentiment_pipeline', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batch_failure_returns_none(self):
+        with mock.patch.object(email_categorizer, 'throttled_huggingface_request', side_effect=OSError('down')):
+            self.assertEqual(email_categorizer.analyze_sentiment_batch(['a', 'b'], make_config()), [None, None])
+
+    def test_batch_error_status_returns_none(self):
+        with mock.patch.object(email_categorizer, 'throttled_huggingface_request', return_value=api_response(503)):
+            self.assertEqual(email_categorizer.analyze_sentiment_batch(['a'], make_config()), [None])
+
+    def test_batch_success_keeps_labels(self):
+        payload = [[{'label': 'NEUTRAL', 'score': 0.9}], [{'label': 'NEGATIVE', 'score': 0.8}]]
+        with mock.patch.object(email_categorizer, 'throttled_huggingface_request', return_value=api_response(200, payload)):
+            self.assertEqual(email_categorizer.analyze_sentiment_batch(['a', 'b'], make_config()), ['NEUTRAL', 'NEGATIVE'])
+
+    def test_single_analysis_still_falls_back_to_neutral(self):
+        with mock.patch.object(email_categorizer, 'throttled_huggingface_request', side_effect=OSError('down')):
+            self.assertEqual(email_categorizer.analyze_sentiment('a', make_config()), 'NEUTRAL')
+
+    def test_combined_fallback_reports_missing_sentiment(self):
+        email_data = {'from': 'a@example.com', 'subject': 'Hello', 'content': 'Body'}
+        with mock.patch.object(email_categorizer, 'throttled_openai_request', side_effect=OSError('down')), \
+             mock.patch.object(email_categorizer, 'throttled_huggingface_request', side_effect=OSError('down')), \
+             mock.patch.object(email_categorizer, 'categorize_email', return_value='General Inquiries') as categorize:
+            sentiment, category = email_categorizer.analyze_and_categorize_email(email_data, make_config())
+        self.assertIsNone(sentiment)
+        self.assertEqual(category, 'General Inquiries')
+        self.assertEqual(categorize.call_args[0][1], 'NEUTRAL')
+
+if __name__ == '__main__':
+    unittest.main()
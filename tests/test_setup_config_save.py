@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Tests that saving config.ini never widens the permissions on the stored password."""
+
+import os
+import stat
+import tempfile
+import unittest
+from unittest import mock
+
+from setup_provider import ProviderSetupWizard
+
+def file_mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+class SaveConfigurationTest(unittest.TestCase):
+
+    def setUp(self):
+        cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+        self.addCleanup(self.tmpdir.cleanup)
+        self.addCleanup(os.chdir, cwd)
+
+        # Skip __init__ so the credential manager is never loaded
+        self.wizard = ProviderSetupWizard.__new__(ProviderSetupWizard)
+        self.wizard._show_next_steps = lambda: None
+
+    def save(self, password='secret'):
+        with mock.patch('builtins.input', return_value='n'), mock.patch('builtins.print'):
+            self.wizard._save_configuration({}, 'me@example.com', password, 'imap.example.com', 993)
+
+    def test_new_config_is_owner_only(self):
+        self.save()
+        self.assertEqual(file_mode('config.ini'), 0o600)
+
+    def test_rewrite_keeps_existing_mode(self):
+        with open('config.ini', 'w') as f:
+            f.write('old')
+        os.chmod('config.ini', 0o600)
+        self.save()
+        self.assertEqual(file_mode('config.ini'), 0o600)
+        with open('config.ini') as f:
+            self.assertIn('password = secret', f.read())
+
+    def test_leftover_temp_file_mode_is_not_reused(self):
+        with open('config.ini.tmp', 'w') as f:
+            f.write('stale')
+        os.chmod('config.ini.tmp', 0o644)
+        self.save()
+        self.assertEqual(file_mode('config.ini'), 0o600)
+        self.assertFalse(os.path.exists('config.ini.tmp'))
+
+    def test_failed_write_removes_temp_file(self):
+        with mock.patch('setup_provider.os.fsync', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.save()
+        self.assertFalse(os.path.exists('config.ini.tmp'))
+        self.assertFalse(os.path.exists('config.ini'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -489,7 +489,8 @@ class EmailCategorizerWebHandler(BaseHTTPRequestHandler):
             import email as email_module
             from email_categorizer import categorize_email, analyze_sentiment
             from email_parser import get_enhanced_email_content
-            from processing_database import record_processed_email
+            from processing_database import record_processed_email, flush_pending_records
+            from sender_rules import sender_rules, rule_headers
             
             # Load configuration
             config = configparser.ConfigParser()
@@ -588,15 +589,6 @@ class EmailCategorizerWebHandler(BaseHTTPRequestHandler):
                     parsed = get_enhanced_email_content(email_message)
                     text_content = parsed.get('text_content') or parsed.get('content', '')
 
-                    # Perform sentiment analysis (expects text and config)
-                    try:
-                        from email_categorizer import load_config
-                        cfg = load_config()
-                    except Exception:
-                        cfg = None
-                    sentiment = analyze_sentiment(text_content[:1000], cfg)
-
-                    # Categorize email (expects structured email, sentiment, config)
                     enhanced_email_data = {
                         'from': parsed.get('from') or sender,
                         'subject': subject,
@@ -604,9 +596,27 @@ class EmailCategorizerWebHandler(BaseHTTPRequestHandler):
                         'has_html': parsed.get('has_html', False),
                         'attachments_count': len(parsed.get('attachments', [])),
                         'text_content': parsed.get('text_content', ''),
-                        'html_content': parsed.get('html_content', '')
+                        'html_content': parsed.get('html_content', ''),
+                        **rule_headers(email_message)
                     }
-                    category = categorize_email(enhanced_email_data, sentiment, cfg)
+
+                    # Config holds the sender-rule switch as well as the API keys
+                    try:
+                        from email_categorizer import load_config
+                        cfg = load_config()
+                    except Exception:
+                        cfg = None
+
+                    # Sender rules settle common senders without either API call
+                    category = sender_rules.match(enhanced_email_data, cfg)
+                    if category:
+                        sentiment = "NEUTRAL"
+                    else:
+                        # Perform sentiment analysis (expects text and config)
+                        sentiment = analyze_sentiment(text_content[:1000], cfg)
+
+                        # Categorize email (expects structured email, sentiment, config)
+                        category = categorize_email(enhanced_email_data, sentiment, cfg)
                     confidence = 0.9
                     
                     processed_email = {
@@ -649,6 +659,9 @@ class EmailCategorizerWebHandler(BaseHTTPRequestHandler):
                         ""
                     ])
             
+            # Write this run's records now rather than leaving them buffered
+            flush_pending_records()
+            
             processing_time = round(time.time() - start_time, 2)
             
             output_lines.extend([
@@ -2986,6 +2999,13 @@ Loading system metrics...
             with open('config.ini', 'w') as configfile:
                 config.write(configfile)
             
+            # Drop the cached configuration so the next run reads the new file
+            try:
+                from email_categorizer import load_config
+                load_config.cache_clear()
+            except ImportError:
+                pass
+            
             response = {"success": True, "message": "Configuration saved successfully"}
             self.wfile.write(json.dumps(response).encode('utf-8'))
             